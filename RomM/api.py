@@ -1,22 +1,149 @@
 import base64
 import datetime
+import errno
+import http.client
+import io
 import json
 import math
 import os
+import queue
+import random
 import re
+import shutil
+import threading
+import time
 import zipfile
-from typing import Tuple
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Iterable, Optional, Tuple
 from urllib.error import HTTPError, URLError
-from urllib.parse import quote, urlencode
-from urllib.request import Request, urlopen
+from urllib.parse import quote
 
 import platform_maps
+from bandwidth import Lane
+from catalog import Catalog
+from connection_pool import ConnectionPool
+from engine import DownloadEngine
 from filesystem import Filesystem
+from hashindex import HashIndex, StreamingChecksum
+from httpcache import ResponseCache
 from imageutils import ImageUtils
-from models import Collection, Platform, Rom, Save, ScreenShot
-from PIL import Image
-from status import Status, View
+from jsonstream import JSONItemStream
+from models import Collection, Platform, Rom, Save, ScreenShot, rom_from_row
 from multipartform import MultiPartForm
+from partfile import PartFile
+from PIL import Image
+from queuejournal import QueueJournal
+from remotezip import (
+    RangeNotSupported,
+    RemoteMember,
+    can_extract,
+    file_crc,
+    matches_rules,
+    read_members,
+)
+from scheduler import DownloadScheduler, QueuePolicy, QueueState
+from status import DownloadProgress, Status, View
+from streamunzip import StreamingUnsupported, StreamingUnzip
+from streamwriter import StreamWriter
+from writebehind import WriteBehind
+
+# Network failures worth retrying: timeouts, resets, refused or dropped connections
+_TRANSIENT_ERRORS = (TimeoutError, ConnectionError, http.client.HTTPException)
+
+
+class RequestOutcome:
+    OK = "ok"
+    NOT_MODIFIED = "not_modified"
+    NOT_FOUND = "not_found"
+    FORBIDDEN = "forbidden"
+    HTTP_ERROR = "http_error"
+    SERVER_ERROR = "server_error"
+    UNREACHABLE = "unreachable"
+    INVALID_URL = "invalid_url"
+    ABORTED = "aborted"
+    CHECKSUM_MISMATCH = "checksum_mismatch"
+
+
+# body is only filled for non-streamed requests, response only for streamed ones
+RequestResult = namedtuple(
+    "RequestResult", ["outcome", "code", "headers", "body", "response"]
+)
+
+# Rom fields read from the top level of a rom payload: key -> default factory,
+# None when the key is required
+_ROM_FIELDS = {
+    "id": None,
+    "platform_id": None,
+    "platform_slug": None,
+    "fs_name": None,
+    "fs_name_no_tags": None,
+    "fs_name_no_ext": None,
+    "fs_extension": None,
+    "fs_size_bytes": None,
+    "name": None,
+    "slug": None,
+    "summary": None,
+    "youtube_video_id": lambda: None,
+    "path_cover_small": None,
+    "path_cover_large": None,
+    "is_identified": None,
+    "revision": lambda: None,
+    "regions": list,
+    "languages": list,
+    "tags": list,
+    "crc_hash": str,
+    "md5_hash": str,
+    "sha1_hash": str,
+    "has_simple_single_file": bool,
+    "has_nested_single_file": bool,
+    "has_multiple_files": bool,
+    "merged_screenshots": list,
+}
+# Rom fields read from the rom's metadatum
+_ROM_METADATUM_FIELDS = {
+    "genres": list,
+    "franchises": list,
+    "collections": list,
+    "companies": list,
+    "game_modes": list,
+    "age_ratings": list,
+    "first_release_date": lambda: None,
+    "average_rating": lambda: None,
+}
+
+
+def _compile_rom_mapping() -> tuple:
+    getters = []
+    for field in Rom._fields:
+        if field == "fs_size":
+            getters.append(
+                lambda rom, _m: API._human_readable_size(rom["fs_size_bytes"])
+            )
+        elif field in _ROM_METADATUM_FIELDS:
+            default = _ROM_METADATUM_FIELDS[field]
+            getters.append(
+                lambda _r, metadatum, f=field, d=default: (
+                    metadatum[f] if f in metadatum else d()
+                )
+            )
+        elif _ROM_FIELDS[field] is None:
+            getters.append(lambda rom, _m, f=field: rom[f])
+        else:
+            default = _ROM_FIELDS[field]
+            getters.append(
+                lambda rom, _m, f=field, d=default: rom[f] if f in rom else d()
+            )
+    return tuple(getters)
+
+
+_ROM_GETTERS = _compile_rom_mapping()
+
+
+def rom_from_json(rom: dict) -> Rom:
+    """Build a Rom straight from one decoded rom payload."""
+    metadatum = rom.get("metadatum") or {}
+    return Rom._make(getter(rom, metadatum) for getter in _ROM_GETTERS)
 
 
 class API:
@@ -29,11 +156,26 @@ class API:
     _states_endpoint = "api/states"
     _user_me_endpoint = "api/users/me"
     _user_profile_picture_url = "assets/romm/assets"
+    _roms_page_size = 250
+    _icon_workers = 4
+    _extract_queue_size = 2
+    _extract_chunk_size = 1024 * 1024
+    # Members this close in a remote zip are fetched in one range, gap included
+    _range_merge_gap = 64 * 1024
+    # Times a ROM failing verification goes back in the queue
+    _checksum_retries = 1
+
+    _max_retries = 3
+    _backoff_base = 0.5  # seconds
+    _backoff_cap = 8.0  # seconds
 
     def __init__(self):
         self.status = Status()
         self.file_system = Filesystem()
         self.image_utils = ImageUtils()
+        self.connection_pool = ConnectionPool()
+        self.response_cache = ResponseCache()
+        self.hash_index = HashIndex()
 
         self.host = os.getenv("HOST", "").strip("/")
         self.username = os.getenv("USERNAME", "")
@@ -48,6 +190,39 @@ class API:
             "true",
             "1",
         )
+        self._download_workers = max(1, self._getenv_int("DOWNLOAD_WORKERS", 2))
+        self._download_segments = max(1, self._getenv_int("DOWNLOAD_SEGMENTS", 1))
+        self._segmented_min_size = (
+            self._getenv_int("SEGMENTED_DOWNLOAD_MIN_SIZE_MB", 64) * 1024 * 1024
+        )
+        self._sync_interval = max(0, self._getenv_int("DOWNLOAD_SYNC_SECONDS", 1))
+        self._extract_include = self._getenv_json("EXTRACT_INCLUDE")
+        self._extract_exclude = self._getenv_json("EXTRACT_EXCLUDE")
+        self._extract_workers = max(
+            1, self._getenv_int("EXTRACT_WORKERS", min(os.cpu_count() or 1, 4))
+        )
+        self.connection_pool.shaper.rate = (
+            max(0, self._getenv_int("DOWNLOAD_RATE_LIMIT_KB", 0)) * 1024
+        )
+
+        self.catalog = Catalog(f"{self.username}@{self.host}")
+        self.queue_journal = QueueJournal(f"{self.username}@{self.host}")
+        # One download queue runs at a time, a new one waits for the last to wind down
+        self._download_session = threading.Lock()
+        download_order = os.getenv("DOWNLOAD_ORDER", QueuePolicy.NAME)
+        if download_order in QueuePolicy.ALL:
+            self.status.download_scheduler.policy = download_order
+        else:
+            print(f"Invalid value for DOWNLOAD_ORDER, using {QueuePolicy.NAME}")
+        self._history_path = os.path.join(
+            os.path.dirname(os.environ.get("LOG_FILE", "./logs/log.txt")),
+            "downloads.jsonl",
+        )
+        self._history_lock = threading.Lock()
+        # Set by start_engine() when downloads run in a process of their own
+        self.engine: Optional[DownloadEngine] = None
+        self._icons_in_flight: set[str] = set()
+        self._icons_lock = threading.Lock()
 
         if self.username and self.password:
             credentials = f"{self.username}:{self.password}"
@@ -59,6 +234,25 @@ class API:
         value = os.getenv(key)
         return [item.strip() for item in value.split(",")] if value is not None else []
 
+    @staticmethod
+    def _getenv_json(key: str) -> dict:
+        value = os.getenv(key)
+        if not value:
+            return {}
+        try:
+            return json.loads(value)
+        except json.JSONDecodeError as e:
+            print(f"Error: {key} is an invalid JSON format: {e}")
+            return {}
+
+    @staticmethod
+    def _getenv_int(key: str, default: int) -> int:
+        try:
+            return int(os.getenv(key, default))
+        except ValueError:
+            print(f"Invalid value for {key}, using {default}")
+            return default
+
     @staticmethod
     def _human_readable_size(size_bytes: int) -> Tuple[float, str]:
         if size_bytes == 0:
@@ -79,36 +273,157 @@ class API:
 
         return os.path.join(*sanitized_parts)
 
-    def _fetch_user_profile_picture(self, avatar_path: str) -> None:
-        fs_extension = avatar_path.split(".")[-1]
-        try:
-            request = Request(
-                f"{self.host}/{self._user_profile_picture_url}/{avatar_path}",
-                headers=self.headers,
-            )
-        except ValueError as e:
-            print(e)
-            self.status.valid_host = False
-            self.status.valid_credentials = False
+    def _backoff(self, attempt: int, abort: Optional[threading.Event] = None) -> bool:
+        """Sleep with exponential backoff and full jitter, False if aborted meanwhile."""
+        delay = random.uniform(0, min(self._backoff_cap, self._backoff_base * 2**attempt))
+        if abort is not None:
+            return not abort.wait(delay)
+        time.sleep(delay)
+        return True
+
+    def _classify(self, result: RequestResult, offline_ok: bool = False) -> None:
+        """
+        Map the outcome of a request to the host/credentials flags shown by the UI.
+        With offline_ok, an unreachable server only flags status.offline, as the
+        caller can keep showing what the catalog holds.
+        """
+        if offline_ok and result.outcome in (
+            RequestOutcome.UNREACHABLE,
+            RequestOutcome.SERVER_ERROR,
+        ):
+            self.status.offline = True
             return
-        try:
-            if request.type not in ("http", "https"):
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
-        except HTTPError as e:
-            print(e)
-            if e.code == 403:
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
-            else:
-                raise
-        except URLError as e:
-            print(e)
+        if result.outcome in (
+            RequestOutcome.OK,
+            RequestOutcome.NOT_MODIFIED,
+            RequestOutcome.NOT_FOUND,
+            RequestOutcome.HTTP_ERROR,
+        ):
+            self.status.valid_host = True
+            self.status.valid_credentials = True
+            self.status.offline = False
+        elif result.outcome == RequestOutcome.FORBIDDEN:
+            self.status.valid_host = True
+            self.status.valid_credentials = False
+        else:
             self.status.valid_host = False
             self.status.valid_credentials = False
+
+    def _request(
+        self,
+        url: str,
+        method: str = "GET",
+        data: Optional[bytes] = None,
+        headers: Optional[dict] = None,
+        timeout: Optional[float] = 60,
+        stream: bool = False,
+        retries: Optional[int] = None,
+        abort: Optional[threading.Event] = None,
+        offline_ok: bool = False,
+        lane: str = Lane.INTERACTIVE,
+    ) -> RequestResult:
+        """
+        Single entry point for every call to the RomM server.
+        Transient failures (timeouts, resets, 5xx) are retried with exponential
+        backoff, and the outcome is classified into status.valid_host and
+        status.valid_credentials. Streamed responses must be closed by the caller.
+        Downloads and uploads go in the bulk lane, everything else is interactive.
+        """
+        request_headers = {**self.headers, **(headers or {})}
+        max_retries = self._max_retries if retries is None else retries
+        attempt = 0
+        while True:
+            try:
+                response = self.connection_pool.request(
+                    url,
+                    method=method,
+                    headers=request_headers,
+                    body=data,
+                    timeout=timeout,
+                    lane=lane,
+                )
+                if response.status == 304:
+                    with response:
+                        response.read()
+                    result = RequestResult(
+                        RequestOutcome.NOT_MODIFIED, 304, response.headers, None, None
+                    )
+                elif stream:
+                    result = RequestResult(
+                        RequestOutcome.OK, response.status, response.headers, None, response
+                    )
+                else:
+                    with response:
+                        body = response.read()
+                    result = RequestResult(
+                        RequestOutcome.OK, response.status, response.headers, body, None
+                    )
+            except ValueError as e:
+                print(f"Invalid URL {url}: {e}")
+                result = RequestResult(RequestOutcome.INVALID_URL, None, None, None, None)
+            except HTTPError as e:
+                print(f"HTTP error {e.code} for {url}")
+                if e.code >= 500 and attempt < max_retries:
+                    if not self._backoff(attempt, abort):
+                        return RequestResult(
+                            RequestOutcome.SERVER_ERROR, e.code, e.headers, None, None
+                        )
+                    attempt += 1
+                    continue
+                if e.code in (401, 403):
+                    outcome = RequestOutcome.FORBIDDEN
+                elif e.code == 404:
+                    outcome = RequestOutcome.NOT_FOUND
+                elif e.code >= 500:
+                    outcome = RequestOutcome.SERVER_ERROR
+                else:
+                    outcome = RequestOutcome.HTTP_ERROR
+                result = RequestResult(outcome, e.code, e.headers, None, None)
+            except (URLError, *_TRANSIENT_ERRORS) as e:
+                reason = e.reason if isinstance(e, URLError) else e
+                print(f"Network error for {url}: {reason}")
+                if isinstance(reason, _TRANSIENT_ERRORS) and attempt < max_retries:
+                    if not self._backoff(attempt, abort):
+                        return RequestResult(
+                            RequestOutcome.UNREACHABLE, None, None, None, None
+                        )
+                    attempt += 1
+                    continue
+                result = RequestResult(RequestOutcome.UNREACHABLE, None, None, None, None)
+            self._classify(result, offline_ok)
+            return result
+
+    def _cache_key(self, url: str) -> str:
+        # Responses depend on the user's permissions, not only on the URL
+        return f"{self.username}@{url}"
+
+    def _fetch_json(self, url: str, offline_ok: bool = False) -> Tuple[str, Any]:
+        """
+        GET a JSON endpoint as a conditional request, answering a 304 with the
+        already-parsed payload from the response cache.
+        """
+        key = self._cache_key(url)
+        result = self._request(
+            url, headers=self.response_cache.validators(key), offline_ok=offline_ok
+        )
+        if result.outcome == RequestOutcome.NOT_MODIFIED:
+            data = self.response_cache.load(key)
+            if data is not None:
+                return RequestOutcome.OK, data
+            # The entry went away after its validators were sent
+            result = self._request(url, offline_ok=offline_ok)
+        if result.outcome != RequestOutcome.OK:
+            return result.outcome, None
+        data = json.loads(result.body.decode("utf-8"))
+        self.response_cache.store(key, result.headers, data)
+        return RequestOutcome.OK, data
+
+    def _fetch_user_profile_picture(self, avatar_path: str) -> None:
+        fs_extension = avatar_path.split(".")[-1]
+        result = self._request(
+            f"{self.host}/{self._user_profile_picture_url}/{avatar_path}"
+        )
+        if result.outcome != RequestOutcome.OK:
             return
         if not os.path.exists(self.file_system.resources_path):
             os.makedirs(self.file_system.resources_path)
@@ -116,83 +431,19 @@ class API:
             f"{self.file_system.resources_path}/{self.username}.{fs_extension}"
         )
         with open(self.status.profile_pic_path, "wb") as f:
-            f.write(response.read())
+            f.write(result.body)
         icon = Image.open(self.status.profile_pic_path)
         icon = icon.resize((26, 26))
         icon.save(self.status.profile_pic_path)
-        self.status.valid_host = True
-        self.status.valid_credentials = True
 
     def fetch_rom_info(self, rom: Rom):
-        try:
-            request = Request(
-                f"{self.host}/{self._roms_endpoint}/{rom.id}",
-                headers=self.headers,
-            )
-        except ValueError as e:
-            print(e)
-            self.status.valid_host = False
-            self.status.valid_credentials = False
+        result = self._request(f"{self.host}/{self._roms_endpoint}/{rom.id}")
+        if result.outcome != RequestOutcome.OK:
+            self.status.saves_ready.set()
             return
-        try:
-            if request.type not in ("http", "https"):
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
-        except HTTPError as e:
-            print(e)
-            if e.code == 403:
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
-            else:
-                raise
-        except URLError as e:
-            print(e)
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
-        
-        rom = json.loads(response.read().decode("utf-8"))
-        metadatum = rom.get("metadatum", {})
-        _rom = Rom(
-                id=rom["id"],
-                platform_id=rom["platform_id"],
-                platform_slug=rom["platform_slug"],
-                fs_name=rom["fs_name"],
-                fs_name_no_tags=rom["fs_name_no_tags"],
-                fs_name_no_ext=rom["fs_name_no_ext"],
-                fs_extension=rom["fs_extension"],
-                fs_size=self._human_readable_size(rom["fs_size_bytes"]),
-                fs_size_bytes=rom["fs_size_bytes"],
-                name=rom["name"],
-                slug=rom["slug"],
-                summary=rom["summary"],
-                youtube_video_id=rom.get("youtube_video_id", None),
-                path_cover_small=rom["path_cover_small"],
-                path_cover_large=rom["path_cover_large"],
-                is_identified=rom["is_identified"],
-                revision=rom.get("revision", None),
-                regions=rom.get("regions", []),
-                languages=rom.get("languages", []),
-                tags=rom.get("tags", []),
-                crc_hash=rom.get("crc_hash", ""),
-                md5_hash=rom.get("md5_hash", ""),
-                sha1_hash=rom.get("sha1_hash", ""),
-                has_simple_single_file=rom.get("has_simple_single_file", False),
-                has_nested_single_file=rom.get("has_nested_single_file", False),
-                has_multiple_files=rom.get("has_multiple_files", False),
-                merged_screenshots=rom.get("merged_screenshots", []),
-                genres=metadatum.get("genres", []),
-                franchises=metadatum.get("franchises", []),
-                collections=metadatum.get("collections", []),
-                companies=metadatum.get("companies", []),
-                game_modes=metadatum.get("game_modes", []),
-                age_ratings=metadatum.get("age_ratings", []),
-                first_release_date=metadatum.get("first_release_date", None),
-                average_rating=metadatum.get("average_rating", None),
-            )
+
+        rom = json.loads(result.body.decode("utf-8"))
+        _rom = rom_from_json(rom)
         _saves = self._parse_saves_states(rom["user_saves"], _rom, False)
         _states = self._parse_saves_states(rom["user_states"], _rom, True)
         self.status.saves = _saves
@@ -247,129 +498,135 @@ class API:
 
     # Public methods
 
-    def fetch_me(self) -> None:
-        try:
-            request = Request(
-                f"{self.host}/{self._user_me_endpoint}", headers=self.headers
-            )
-        except ValueError as e:
-            print(e)
-            self.status.valid_host = False
-            self.status.valid_credentials = False
+    def start_engine(self) -> None:
+        """Move the ROM download queue to a process of its own if DOWNLOAD_PROCESS is set."""
+        if os.getenv("DOWNLOAD_PROCESS", "false") not in ("true", "1"):
             return
+        engine = DownloadEngine(
+            self.status,
+            self.queue_journal.load,
+            self.restore_download_queue,
+            self._stop_engine,
+            self.connection_pool.shaper,
+        )
         try:
-            if request.type not in ("http", "https"):
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
-        except HTTPError as e:
-            print(e)
-            if e.code == 403:
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
-            else:
-                raise
-        except URLError as e:
-            print(e)
-            self.status.valid_host = False
-            self.status.valid_credentials = False
+            engine.start()
+        except OSError as e:
+            print(f"Error starting the download engine, downloading in the app: {e}")
+            engine.progress.close(unlink=True)
             return
-        me = json.loads(response.read().decode("utf-8"))
+        self.engine = engine
+
+    def _stop_engine(self, roms: list[Rom]) -> None:
+        """Run the download queue in the app again, after the engine gave up."""
+        self.engine = None
+        self.status.download_scheduler = DownloadScheduler(
+            self.status.download_scheduler.policy
+        )
+        self.restore_download_queue()
+        if roms:
+            self.queue_roms(roms)
+
+    def shutdown(self) -> None:
+        if self.engine is not None:
+            self.engine.stop()
+
+    def restore_download_queue(self) -> None:
+        """Start again the ROMs left in the download queue by the last session."""
+        roms = self.queue_journal.load()
+        if roms:
+            print(f"Resuming {len(roms)} queued downloads")
+            self.status.abort_download.clear()
+            self.queue_roms(roms)
+
+    def load_catalog(self) -> None:
+        """Show the platforms and collections saved from the last session right away."""
+        platforms = self.catalog.load_platforms()
+        if platforms:
+            self.status.platforms = platforms
+            self.status.platforms_ready.set()
+        collections = self.catalog.load_collections()
+        if collections:
+            self.status.collections = collections
+            self.status.collections_ready.set()
+        print(
+            f"Loaded {len(platforms)} platforms and {len(collections)} collections from catalog"
+        )
+
+    def fetch_me(self) -> None:
+        result = self._request(f"{self.host}/{self._user_me_endpoint}")
+        if result.outcome != RequestOutcome.OK:
+            return
+        me = json.loads(result.body.decode("utf-8"))
         self.status.me = me
         if me["avatar_path"]:
             self._fetch_user_profile_picture(me["avatar_path"])
         self.status.me_ready.set()
 
     def _fetch_platform_icon(self, platform_slug) -> None:
-        try:
-            mapped_slug, icon_filename = platform_maps.ES_FOLDER_MAP.get(
-                platform_slug.lower(), (platform_slug, platform_slug)
-            )
-            icon_url = f"{self.host}/{self._platform_icon_url}/{icon_filename}.ico"
-            request = Request(
-                f"{self.host}/{self._platform_icon_url}/{icon_filename}.ico",
-                headers=self.headers,
-            )
-        except ValueError as e:
-            print(e)
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
-
-        try:
-            if request.type not in ("http", "https"):
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
-        except HTTPError as e:
-            print(e)
-            if e.code == 403:
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
+        mapped_slug, icon_filename = platform_maps.ES_FOLDER_MAP.get(
+            platform_slug.lower(), (platform_slug, platform_slug)
+        )
+        icon_url = f"{self.host}/{self._platform_icon_url}/{icon_filename}.ico"
+        result = self._request(icon_url)
+        if result.outcome == RequestOutcome.NOT_FOUND:
             # Icon is missing on the server
-            elif e.code == 404:
-                self.status.valid_host = True
-                self.status.valid_credentials = True
-                print(f"Requested icon not found: {icon_url}")
-                return
-            else:
-                raise
-        except URLError as e:
-            print(e)
-            self.status.valid_host = False
-            self.status.valid_credentials = False
+            print(f"Requested icon not found: {icon_url}")
+            return
+        if result.outcome != RequestOutcome.OK:
             return
 
         self.file_system.resources_path = os.getcwd() + "/resources"
-        if not os.path.exists(self.file_system.resources_path):
-            os.makedirs(self.file_system.resources_path)
+        os.makedirs(self.file_system.resources_path, exist_ok=True)
 
-        with open(f"{self.file_system.resources_path}/{platform_slug}.ico", "wb") as f:
-            f.write(response.read())
+        # The UI opens icons every frame, so only ever expose a complete file
+        icon_path = f"{self.file_system.resources_path}/{platform_slug}.ico"
+        tmp_path = f"{icon_path}.{threading.get_ident()}.tmp"
+        try:
+            icon = Image.open(io.BytesIO(result.body))
+            icon = icon.resize((30, 30))
+            icon.save(tmp_path, format="ICO")
+            os.replace(tmp_path, icon_path)
+        except OSError as e:
+            print(f"Error saving icon {icon_url}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _fetch_platform_icons(self, platform_slugs: list[str]) -> None:
+        """Fetch the given icons over a bounded pool, skipping those already in flight."""
+        with self._icons_lock:
+            platform_slugs = [
+                slug for slug in platform_slugs if slug not in self._icons_in_flight
+            ]
+            self._icons_in_flight.update(platform_slugs)
+        if not platform_slugs:
+            return
+
+        def fetch(platform_slug: str) -> None:
+            try:
+                self._fetch_platform_icon(platform_slug)
+            finally:
+                with self._icons_lock:
+                    self._icons_in_flight.discard(platform_slug)
 
-        icon = Image.open(f"{self.file_system.resources_path}/{platform_slug}.ico")
-        icon = icon.resize((30, 30))
-        icon.save(f"{self.file_system.resources_path}/{platform_slug}.ico")
-        self.status.valid_host = True
-        self.status.valid_credentials = True
+        with ThreadPoolExecutor(
+            max_workers=self._icon_workers, thread_name_prefix="icons"
+        ) as executor:
+            list(executor.map(fetch, platform_slugs))
+        print(f"Fetched {len(platform_slugs)} platform icons")
 
     def fetch_platforms(self) -> None:
-        try:
-            request = Request(
-                f"{self.host}/{self._platforms_endpoint}", headers=self.headers
-            )
-        except ValueError:
-            self.status.platforms = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
-        try:
-            if request.type not in ("http", "https"):
-                self.status.platforms = []
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
-        except HTTPError as e:
-            print(f"HTTP Error in fetching platforms: {e}")
-            if e.code == 403:
+        # With platforms already on screen, revalidate them and stay browsable offline
+        offline_ok = len(self.status.platforms) > 0
+        outcome, platforms = self._fetch_json(
+            f"{self.host}/{self._platforms_endpoint}", offline_ok=offline_ok
+        )
+        if outcome != RequestOutcome.OK:
+            print(f"Error fetching platforms: {outcome}")
+            if not self.status.offline:
                 self.status.platforms = []
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
-            else:
-                raise
-        except URLError:
-            print("URLError in fetching platforms")
-            self.status.platforms = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
+            self.status.platforms_ready.set()
             return
-        platforms = json.loads(response.read().decode("utf-8"))
         _platforms: list[Platform] = []
 
         # Get the list of subfolders in the ROMs directory for PM filtering
@@ -432,66 +689,27 @@ class API:
                     )
                 )
 
-                self.file_system.resources_path = os.getcwd() + "/resources"
-                icon_path = f"{self.file_system.resources_path}/{platform['slug']}.ico"
-                if not os.path.exists(icon_path):
-                    self._fetch_platform_icon(platform["slug"])
-
-        self.status.platforms = _platforms
+        if _platforms != self.status.platforms:
+            self.status.platforms = _platforms
+            self.catalog.save_platforms(_platforms)
         print(f"Fetched {len(_platforms)} platforms")
-        self.status.valid_host = True
-        self.status.valid_credentials = True
         self.status.platforms_ready.set()
 
-    def fetch_collections(self) -> None:
-        try:
-            collections_request = Request(
-                f"{self.host}/{self._collections_endpoint}", headers=self.headers
-            )
-            v_collections_request = Request(
-                f"{self.host}/{self._virtual_collections_endpoint}?type={self._collection_type}",
-                headers=self.headers,
-            )
-        except ValueError:
-            self.status.collections = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
-
-        try:
-            if collections_request.type not in ("http", "https"):
-                self.status.collections = []
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-
-            collections_response = urlopen(  # trunk-ignore(bandit/B310)
-                collections_request, timeout=60
-            )
-            v_collections_response = urlopen(  # trunk-ignore(bandit/B310)
-                v_collections_request, timeout=60
-            )
-        except HTTPError as e:
-            if e.code == 403:
-                self.status.collections = []
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
-            else:
-                raise
-        except URLError:
-            self.status.collections = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
-
-        collections = json.loads(collections_response.read().decode("utf-8"))
-        v_collections = json.loads(v_collections_response.read().decode("utf-8"))
+        # Icons land after the list is shown, the UI picks each one up as it's written
+        self.file_system.resources_path = os.getcwd() + "/resources"
+        self._fetch_platform_icons(
+            [
+                platform.slug
+                for platform in _platforms
+                if not os.path.exists(
+                    f"{self.file_system.resources_path}/{platform.slug}.ico"
+                )
+            ]
+        )
 
+    def _parse_collections(self, collections, virtual: bool) -> list[Collection]:
         if isinstance(collections, dict):
             collections = collections["items"]
-        if isinstance(v_collections, dict):
-            v_collections = v_collections["items"]
 
         _collections: list[Collection] = []
 
@@ -508,84 +726,58 @@ class API:
                         id=collection["id"],
                         name=collection["name"],
                         rom_count=collection["rom_count"],
-                        virtual=False,
-                    )
-                )
-
-        for v_collection in v_collections:
-            if v_collection["rom_count"] > 0:
-                if self._include_collections:
-                    if v_collection["name"] not in self._include_collections:
-                        continue
-                elif self._exclude_collections:
-                    if v_collection["name"] in self._exclude_collections:
-                        continue
-                _collections.append(
-                    Collection(
-                        id=v_collection["id"],
-                        name=v_collection["name"],
-                        rom_count=v_collection["rom_count"],
-                        virtual=True,
+                        virtual=virtual,
                     )
                 )
 
-        self.status.collections = _collections
-        self.status.valid_host = True
-        self.status.valid_credentials = True
-        self.status.collections_ready.set()
+        return _collections
 
-    def fetch_roms(self) -> None:
-        if self.status.selected_platform:
-            view = View.PLATFORMS
-            id = self.status.selected_platform.id
-            selected_platform_slug = self.status.selected_platform.slug.lower()
-        elif self.status.selected_collection:
-            view = View.COLLECTIONS
-            id = self.status.selected_collection.id
-            selected_platform_slug = None
-        elif self.status.selected_virtual_collection:
-            view = View.VIRTUAL_COLLECTIONS
-            id = self.status.selected_virtual_collection.id
-            selected_platform_slug = None
-        else:
-            return
-
-        try:
-            request = Request(
-                f"{self.host}/{self._roms_endpoint}?{view}_ids={id}&order_by=name&order_dir=asc&limit=10000",
-                headers=self.headers,
-            )
-        except ValueError:
-            self.status.roms = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
-        try:
-            if request.type not in ("http", "https"):
-                self.status.roms = []
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=1800)  # trunk-ignore(bandit/B310)
-        except HTTPError as e:
-            if e.code == 403:
-                self.status.roms = []
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
-            else:
-                raise
-        except URLError:
-            self.status.roms = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
+    def fetch_collections(self) -> None:
+        offline_ok = len(self.status.collections) > 0
+        urls = {
+            False: f"{self.host}/{self._collections_endpoint}",
+            True: f"{self.host}/{self._virtual_collections_endpoint}?type={self._collection_type}",
+        }
+        # Start from what is shown so the slower half doesn't blank the other one
+        halves = {
+            virtual: [c for c in self.status.collections if c.virtual == virtual]
+            for virtual in urls
+        }
+        failed = []
+
+        with ThreadPoolExecutor(
+            max_workers=len(urls), thread_name_prefix="collections"
+        ) as executor:
+            futures = {
+                executor.submit(self._fetch_json, url, offline_ok): virtual
+                for virtual, url in urls.items()
+            }
+            for future in as_completed(futures):
+                virtual = futures[future]
+                outcome, collections = future.result()
+                if outcome != RequestOutcome.OK:
+                    print(f"Fetching {urls[virtual]} failed: {outcome}")
+                    failed.append(virtual)
+                    continue
+                halves[virtual] = self._parse_collections(collections, virtual)
+                # Regular collections always come first, whichever half lands first
+                _collections = halves[False] + halves[True]
+                if _collections != self.status.collections:
+                    self.status.collections = _collections
+
+        if failed:
+            # Offline, the cached half stays. Online, only the half that failed goes
+            if not self.status.offline:
+                for virtual in failed:
+                    halves[virtual] = []
+                self.status.collections = halves[False] + halves[True]
+            self.status.collections_ready.set()
             return
 
-        # { 'items': list[dict], 'total': number, 'limit': number, 'offset': number }
-        roms = json.loads(response.read().decode("utf-8"))
-        if isinstance(roms, dict):
-            roms = roms["items"]
+        self.catalog.save_collections(self.status.collections)
+        self.status.collections_ready.set()
 
+    def _roms_subfolders(self) -> set[str]:
         # Get the list of subfolders in the ROMs directory for non-muOS filtering
         roms_subfolders = set()
         if not self.file_system.is_muos and not self.file_system.is_spruceos and not self.file_system.is_trimui_stock:
@@ -596,10 +788,18 @@ class API:
                     for d in os.listdir(roms_path)
                     if os.path.isdir(os.path.join(roms_path, d))
                 }
-
+        return roms_subfolders
+
+    def _filter_roms(
+        self,
+        roms: Iterable[Rom],
+        view: str,
+        selected_platform_slug: Optional[str],
+        roms_subfolders: set[str],
+    ) -> list[Rom]:
         _roms = []
         for rom in roms:
-            platform_slug: str = rom["platform_slug"].lower()
+            platform_slug: str = rom.platform_slug.lower()
             if (
                 platform_maps._env_maps
                 and platform_slug in platform_maps._env_platforms
@@ -624,240 +824,1345 @@ class API:
             if view == View.PLATFORMS and platform_slug != selected_platform_slug:
                 continue
 
-            metadatum = rom.get("metadatum", {})
-            _roms.append(
-                Rom(
-                    id=rom["id"],
-                    platform_id=rom["platform_id"],
-                    platform_slug=rom["platform_slug"],
-                    fs_name=rom["fs_name"],
-                    fs_name_no_tags=rom["fs_name_no_tags"],
-                    fs_name_no_ext=rom["fs_name_no_ext"],
-                    fs_extension=rom["fs_extension"],
-                    fs_size=self._human_readable_size(rom["fs_size_bytes"]),
-                    fs_size_bytes=rom["fs_size_bytes"],
-                    name=rom["name"],
-                    slug=rom["slug"],
-                    summary=rom["summary"],
-                    youtube_video_id=rom.get("youtube_video_id", None),
-                    path_cover_small=rom["path_cover_small"],
-                    path_cover_large=rom["path_cover_large"],
-                    is_identified=rom["is_identified"],
-                    revision=rom.get("revision", None),
-                    regions=rom.get("regions", []),
-                    languages=rom.get("languages", []),
-                    tags=rom.get("tags", []),
-                    crc_hash=rom.get("crc_hash", ""),
-                    md5_hash=rom.get("md5_hash", ""),
-                    sha1_hash=rom.get("sha1_hash", ""),
-                    has_simple_single_file=rom.get("has_simple_single_file", False),
-                    has_nested_single_file=rom.get("has_nested_single_file", False),
-                    has_multiple_files=rom.get("has_multiple_files", False),
-                    merged_screenshots=rom.get("merged_screenshots", []),
-                    genres=metadatum.get("genres", []),
-                    franchises=metadatum.get("franchises", []),
-                    collections=metadatum.get("collections", []),
-                    companies=metadatum.get("companies", []),
-                    game_modes=metadatum.get("game_modes", []),
-                    age_ratings=metadatum.get("age_ratings", []),
-                    first_release_date=metadatum.get("first_release_date", None),
-                    average_rating=metadatum.get("average_rating", None),
+            _roms.append(rom)
+
+        return _roms
+
+    def _fetch_roms_page(
+        self, url: str, abort: threading.Event, offline_ok: bool = False
+    ) -> Tuple[str, list[Rom], Optional[int]]:
+        """
+        Fetch one page of api/roms, returning its outcome, every Rom on it
+        (before filtering) and the total reported by the server.
+        """
+        key = self._cache_key(url)
+        validators = self.response_cache.validators(key)
+        attempt = 0
+        while True:
+            result = self._request(
+                url,
+                headers=validators,
+                stream=True,
+                abort=abort,
+                offline_ok=offline_ok,
+            )
+            if result.outcome == RequestOutcome.NOT_MODIFIED:
+                cached = self.response_cache.load(key)
+                if cached is not None:
+                    roms = [rom_from_row(row) for row in cached["roms"]]
+                    return RequestOutcome.OK, roms, cached["total"]
+                # The entry went away after its validators were sent
+                validators = {}
+                continue
+            if result.outcome != RequestOutcome.OK:
+                return result.outcome, [], None
+            if abort.is_set():
+                result.response.close()
+                return RequestOutcome.ABORTED, [], None
+
+            # { 'items': list[dict], 'total': number, 'limit': number, 'offset': number }
+            page = JSONItemStream(result.response)
+            try:
+                with result.response:
+                    roms = [rom_from_json(rom) for rom in page]
+            except _TRANSIENT_ERRORS as e:
+                print(f"Roms page {url} interrupted: {e}")
+                if attempt < self._max_retries and self._backoff(attempt, abort):
+                    attempt += 1
+                    continue
+                result = RequestResult(RequestOutcome.UNREACHABLE, None, None, None, None)
+                self._classify(result, offline_ok)
+                return result.outcome, [], None
+
+            total = page.meta.get("total")
+            self.response_cache.store(
+                key, result.headers, {"roms": [list(rom) for rom in roms], "total": total}
+            )
+            return RequestOutcome.OK, roms, total
+
+    def fetch_roms(self) -> None:
+        # Captured once: backing out of the view swaps in a new event and sets this one
+        abort = self.status.roms_fetch_abort
+        if self.status.selected_platform:
+            view = View.PLATFORMS
+            id = self.status.selected_platform.id
+            selected_platform_slug = self.status.selected_platform.slug.lower()
+        elif self.status.selected_collection:
+            view = View.COLLECTIONS
+            id = self.status.selected_collection.id
+            selected_platform_slug = None
+        elif self.status.selected_virtual_collection:
+            view = View.VIRTUAL_COLLECTIONS
+            id = self.status.selected_virtual_collection.id
+            selected_platform_slug = None
+        else:
+            self.status.roms_ready.set()
+            return
+
+        roms_subfolders = self._roms_subfolders()
+        self.status.roms_loaded = 0
+        self.status.roms_total = 0
+        # Show the catalog copy at once and only swap in the server's list if it differs
+        cached = self._filter_roms(
+            self.catalog.load_roms(view, id),
+            view,
+            selected_platform_slug,
+            roms_subfolders,
+        )
+        if cached:
+            self.status.roms = cached
+            self.status.roms_ready.set()
+        fetched: list[Rom] = []
+        _roms: list[Rom] = []
+        offset = 0
+        while True:
+            outcome, page_roms, total = self._fetch_roms_page(
+                f"{self.host}/{self._roms_endpoint}?{view}_ids={id}&order_by=name&order_dir=asc"
+                f"&limit={self._roms_page_size}&offset={offset}",
+                abort,
+                offline_ok=bool(cached),
+            )
+            if abort.is_set():
+                print(f"Cancelled fetching roms at {offset}/{self.status.roms_total}")
+                return
+            if outcome != RequestOutcome.OK:
+                # Keep the catalog copy, or whatever pages already arrived
+                if offset == 0 and not cached:
+                    self.status.roms = []
+                self.status.roms_ready.set()
+                return
+
+            fetched.extend(page_roms)
+            _roms.extend(
+                self._filter_roms(
+                    page_roms, view, selected_platform_slug, roms_subfolders
                 )
             )
+            if not cached:
+                # The first page replaces the previous list so refreshes don't flicker
+                self.status.roms = _roms
+            offset += len(page_roms)
+            # Older servers answer with the full, unpaginated list and no total
+            total = offset if total is None else total
+            self.status.roms_loaded = offset
+            self.status.roms_total = total
+            if offset >= total or not page_roms:
+                break
 
-        self.status.roms = _roms
-        self.status.valid_host = True
-        self.status.valid_credentials = True
+        if _roms != self.status.roms:
+            self.status.roms = _roms
+        self.catalog.save_roms(view, id, fetched)
+        print(f"Fetched {len(_roms)} roms")
         self.status.roms_ready.set()
+        self._scan_hashes(_roms, abort)
+
+    def _scan_hashes(self, roms: list[Rom], abort: threading.Event) -> None:
+        """
+        Hash the single-file ROMs already on the device that the hash index
+        doesn't know yet, so downloading them again can be skipped.
+        """
+        scanned = 0
+        for rom in roms:
+            if abort.is_set():
+                return
+            if rom.has_multiple_files:
+                continue
+            checksum = StreamingChecksum(rom)
+            dest_path = self._rom_dest_path(rom)
+            if (
+                not checksum.can_verify
+                or not os.path.isfile(dest_path)
+                or self.hash_index.lookup(dest_path)
+            ):
+                continue
+            try:
+                stat = os.stat(dest_path)
+                checksum.update_from_file(dest_path)
+                if os.stat(dest_path).st_mtime_ns != stat.st_mtime_ns:
+                    # Rewritten while being read
+                    continue
+            except OSError:
+                continue
+            self.hash_index.record(
+                dest_path, checksum.crc, checksum.sha1, checksum.md5, stat
+            )
+            scanned += 1
+        if scanned:
+            print(f"Indexed hashes of {scanned} roms on the device")
 
     def _reset_download_status(
         self, valid_host: bool = False, valid_credentials: bool = False
     ) -> None:
-        self.status.total_downloaded_bytes = 0
-        self.status.downloaded_percent = 0.0
         self.status.valid_host = valid_host
         self.status.valid_credentials = valid_credentials
-        self.status.downloading_rom = None
-        self.status.extracting_rom = False
+        self.status.active_downloads = []
+        self.status.finished_downloads = 0
+        self.status.finished_download_bytes = 0
         self.status.multi_selected_roms = []
-        self.status.download_queue = []
         self.status.download_rom_ready.set()
         self.status.downloading_save = None
+        self.status.save_download = None
         self.status.multi_selected_saves = []
         self.status.download_queue_saves = []
         self.status.download_saves_ready.set()
         self.status.abort_download.set()
 
-    def download_rom(self) -> None:
-        self.status.download_queue.sort(key=lambda rom: rom.name)
-        for i, rom in enumerate(self.status.download_queue):
-            self.status.downloading_rom = rom
-            self.status.downloading_rom_position = i + 1
-            dest_path = os.path.join(
-                self.file_system.get_platforms_storage_path(rom.platform_slug),
-                self._sanitize_filename(rom.fs_name),
+    def _verify_part(self, part: PartFile, checksum: Optional[StreamingChecksum]) -> bool:
+        """Check a completed part against the server hashes, dropping it on mismatch."""
+        if checksum is None or checksum.matches():
+            return True
+        print(
+            f"Checksum mismatch for {part.dest_path}: "
+            f"got {checksum.digest}, expected {checksum.expected_digest}"
+        )
+        part.discard()
+        return False
+
+    def _download_to_file(
+        self,
+        url: str,
+        dest_path: str,
+        progress: DownloadProgress,
+        checksum: Optional[StreamingChecksum] = None,
+    ) -> str:
+        """Download url into dest_path and record the transfer in the download history."""
+        outcome = self._stream_to_file(url, dest_path, progress, checksum)
+        self._log_transfer(url, progress, outcome)
+        return outcome
+
+    def _log_transfer(self, url: str, progress: DownloadProgress, outcome: str) -> None:
+        """
+        Append one line per transfer to logs/downloads.jsonl, to tell a slow
+        server (ttfb), link (rate, read_stall) or SD card (write_stall) apart.
+        """
+        duration = time.monotonic() - progress.started
+        entry = {
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "file": progress.file_name,
+            "url": url,
+            "outcome": outcome,
+            "bytes": progress.transferred_bytes,
+            "size": progress.total_bytes,
+            "duration": round(duration, 3),
+            "ttfb": round(progress.ttfb, 3) if progress.ttfb is not None else None,
+            "write_stall": round(progress.write_stall, 3),
+            "read_stall": round(progress.read_stall, 3),
+            "rate": round(progress.transferred_bytes / duration) if duration else 0,
+            "workers": self._download_workers,
+            "segments": self._download_segments,
+        }
+        try:
+            with self._history_lock:
+                os.makedirs(os.path.dirname(self._history_path), exist_ok=True)
+                with open(self._history_path, "a") as f:
+                    f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"Error writing download history: {e}")
+
+    def _stream_to_file(
+        self,
+        url: str,
+        dest_path: str,
+        progress: DownloadProgress,
+        checksum: Optional[StreamingChecksum] = None,
+    ) -> str:
+        """
+        Stream url into dest_path through a .part file, resuming with a Range
+        request after the connection drops, or on a later run, instead of starting
+        over. The part is kept on failure and removed on abort. With a checksum,
+        data is hashed as it streams and the file is only moved into place (and
+        recorded in the hash index) if it matches. Returns the RequestOutcome of
+        the last attempt.
+        """
+        expected_size = progress.total_bytes
+        part = PartFile(dest_path, url)
+        segmented = (
+            self._download_segments > 1 and expected_size >= self._segmented_min_size
+        )
+        if part.segments and not segmented:
+            # Left by a segmented download, it can't be continued as one stream
+            part.reset()
+        if segmented and not (part.received and not part.segments):
+            outcome = self._download_segmented(url, part, progress, checksum)
+            if outcome is not None:
+                return outcome
+            print(f"Server ignored Range for {url}, downloading as a single stream")
+
+        attempt = 0
+        while True:
+            requested = time.monotonic()
+            result = self._request(
+                url,
+                headers=part.resume_headers(),
+                stream=True,
+                abort=self.status.abort_download,
+                lane=Lane.BULK,
             )
-            url = f"{self.host}/{self._roms_endpoint}/{rom.id}/content/{quote(rom.fs_name)}?hidden_folder=true"
-            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
-
-            try:
-                print(f"Fetching: {url}")
-                request = Request(url, headers=self.headers)
-            except ValueError:
-                self._reset_download_status()
-                return
-
+            if result.outcome == RequestOutcome.OK and progress.ttfb is None:
+                progress.ttfb = time.monotonic() - requested
+            if result.code == 416 and part.received:
+                # The recorded range no longer fits the remote file
+                part.reset()
+                continue
+            if result.outcome != RequestOutcome.OK:
+                if self.status.abort_download.is_set():
+                    part.discard()
+                    return RequestOutcome.ABORTED
+                return result.outcome
+            offset = part.begin(result.code, result.headers)
+            if offset:
+                print(f"Resuming download of {url} at {offset} bytes")
+            if checksum is not None:
+                checksum.reset()
+                if offset:
+                    # The resumed prefix was hashed by an earlier attempt, read it back
+                    checksum.update_from_file(part.part_path, offset)
             try:
-                if request.type not in ("http", "https"):
-                    self._reset_download_status()
-                    return
-                print(f"Downloading {rom.name} to {dest_path}")
                 with (
-                    urlopen(request) as response,  # trunk-ignore(bandit/B310)
-                    open(dest_path, "wb") as out_file,
+                    result.response as response,
+                    open(part.part_path, "r+b" if offset else "wb") as out_file,
                 ):
-                    self.status.total_downloaded_bytes = 0
-                    chunk_size = 1024
-                    while True:
-                        if not self.status.abort_download.is_set():
-                            chunk = response.read(chunk_size)
-                            if not chunk:
-                                print("Finalized download")
-                                break
-                            out_file.write(chunk)
-                            self.status.valid_host = True
-                            self.status.valid_credentials = True
-                            self.status.total_downloaded_bytes += len(chunk)
-                            self.status.downloaded_percent = (
-                                self.status.total_downloaded_bytes
-                                / (
-                                    self.status.downloading_rom.fs_size_bytes + 1
-                                )  # Add 1 virtual byte to avoid division by zero
-                            ) * 100
-                        else:
-                            self._reset_download_status(True, True)
-                            os.remove(dest_path)
-                            return
-
-                # Handle multi-file (ZIP) ROMs
-                if rom.has_multiple_files:
-                    self.status.extracting_rom = True
-                    print("Multi-file rom detected. Extracting...")
-                    with zipfile.ZipFile(dest_path, "r") as zip_ref:
-                        total_size = sum(file.file_size for file in zip_ref.infolist())
-                        extracted_size = 0
-                        chunk_size = 1024
-                        for file in zip_ref.infolist():
-                            if not self.status.abort_download.is_set():
-                                file_path = os.path.join(
-                                    os.path.dirname(dest_path),
-                                    self._sanitize_filename(file.filename),
-                                )
-                                os.makedirs(os.path.dirname(file_path), exist_ok=True)
-                                with (
-                                    zip_ref.open(file) as source,
-                                    open(file_path, "wb") as target,
-                                ):
-                                    while True:
-                                        chunk = source.read(chunk_size)
-                                        if not chunk:
-                                            break
-                                        target.write(chunk)
-                                        extracted_size += len(chunk)
-                                        self.status.extracted_percent = (
-                                            extracted_size / total_size
-                                        ) * 100
-                                if file.filename.endswith(".m3u"):
-                                    # Remove some files from m3u file
-                                    # sbi files are psx files for encrypted games
-                                    ignored_extensions = ['.sbi']
-                                    with open(file_path, "r") as m3u_file:
-                                        lines = m3u_file.readlines()
-                                    with open(file_path, "w") as m3u_file:
-                                        for line in lines:
-                                            if not any(ext in line.lower() for ext in ignored_extensions):
-                                                m3u_file.write(line)
-                            else:
-                                self._reset_download_status(True, True)
-                                os.remove(dest_path)
-                                return
-                    self.status.extracting_rom = False
-                    self.status.downloading_rom = None
-                    os.remove(dest_path)
-                    print(f"Extracted {rom.name} at {os.path.dirname(dest_path)}")
-            except HTTPError as e:
-                if e.code == 403:
-                    self._reset_download_status(valid_host=True)
+                    out_file.seek(offset)
+                    out_file.truncate()
+                    if part.size is not None:
+                        self._preallocate(out_file.fileno(), part.size)
+                    part.save()
+                    last_saved = time.monotonic()
+                    progress.downloaded_bytes = offset
+
+                    def write(view: memoryview) -> None:
+                        if checksum is not None:
+                            checksum.update(view)
+                        out_file.write(view)
+
+                    def on_written(n: int) -> None:
+                        nonlocal last_saved
+                        part.received += n
+                        if (
+                            self._sync_interval
+                            and time.monotonic() - last_saved >= self._sync_interval
+                        ):
+                            # Only record bytes that are safely on disk
+                            out_file.flush()
+                            os.fsync(out_file.fileno())
+                            part.save()
+                            last_saved = time.monotonic()
+
+                    with WriteBehind(
+                        write, on_written, self.status.abort_download, progress
+                    ) as writer:
+                        StreamWriter(
+                            progress.add_downloaded,
+                            self.status.abort_download,
+                            self.connection_pool.shaper,
+                        ).copy(response, writer.write)
+                    if (
+                        not self.status.abort_download.is_set()
+                        and part.size is not None
+                        and part.received < part.size
+                    ):
+                        # The server closed the connection before the end
+                        raise http.client.IncompleteRead(b"", part.size - part.received)
+            except _TRANSIENT_ERRORS as e:
+                print(f"Download of {url} interrupted at {part.received} bytes: {e}")
+                if self.status.abort_download.is_set():
+                    part.discard()
+                    return RequestOutcome.ABORTED
+                # The file was closed above, everything received is in the part
+                part.save()
+                if attempt < self._max_retries and self._backoff(
+                    attempt, self.status.abort_download
+                ):
+                    attempt += 1
+                    continue
+                if self.status.abort_download.is_set():
+                    part.discard()
+                    return RequestOutcome.ABORTED
+                result = RequestResult(RequestOutcome.UNREACHABLE, None, None, None, None)
+                self._classify(result)
+                return result.outcome
+            if self.status.abort_download.is_set():
+                part.discard()
+                return RequestOutcome.ABORTED
+            print("Finalized download")
+            if not self._verify_part(part, checksum):
+                return RequestOutcome.CHECKSUM_MISMATCH
+            part.commit()
+            self._record_hashes(dest_path, checksum)
+            return RequestOutcome.OK
+
+    def _record_hashes(
+        self, dest_path: str, checksum: Optional[StreamingChecksum]
+    ) -> None:
+        if checksum is not None:
+            self.hash_index.record(dest_path, checksum.crc, checksum.sha1, checksum.md5)
+
+    def _plan_segments(self, size: int) -> list[list[int]]:
+        step = math.ceil(size / self._download_segments)
+        return [
+            [start, start, min(start + step, size) - 1] for start in range(0, size, step)
+        ]
+
+    @staticmethod
+    def _range_honoured(result: RequestResult, segment: list[int], size: int) -> bool:
+        match = re.match(
+            r"bytes (\d+)-(\d+)/(\d+)", result.headers.get("Content-Range", "")
+        )
+        return (
+            result.code == 206
+            and match is not None
+            and int(match.group(1)) == segment[1]
+            and int(match.group(2)) == segment[2]
+            and int(match.group(3)) == size
+        )
+
+    def _download_segmented(
+        self,
+        url: str,
+        part: PartFile,
+        progress: DownloadProgress,
+        checksum: Optional[StreamingChecksum] = None,
+    ) -> Optional[str]:
+        """
+        Download url as concurrent byte ranges, each over its own pooled connection,
+        written at their offsets in a preallocated part file. Returns None when
+        the server doesn't honour Range, so the caller can fall back to one stream.
+        Ranges arrive out of order, so a checksum is computed by reading the
+        completed part back once.
+        """
+        abort = self.status.abort_download
+        size = progress.total_bytes
+        resumed = bool(part.segments)
+        if not resumed:
+            part.reset()
+            part.segments = self._plan_segments(size)
+        pending = [segment for segment in part.segments if segment[1] <= segment[2]]
+
+        def segment_headers(segment: list[int]) -> dict:
+            headers = {"Range": f"bytes={segment[1]}-{segment[2]}"}
+            if part.validator:
+                headers["If-Range"] = part.validator
+            return headers
+
+        # The first range doubles as a probe of Range support
+        probe = None
+        if pending:
+            requested = time.monotonic()
+            probe = self._request(
+                url,
+                headers=segment_headers(pending[0]),
+                stream=True,
+                abort=abort,
+                lane=Lane.BULK,
+            )
+            if probe.outcome == RequestOutcome.OK and progress.ttfb is None:
+                progress.ttfb = time.monotonic() - requested
+            if probe.outcome != RequestOutcome.OK:
+                if abort.is_set():
+                    part.discard()
+                    return RequestOutcome.ABORTED
+                return probe.outcome
+            if not self._range_honoured(probe, pending[0], size):
+                probe.response.close()
+                # With a resumed part, the remote file changed since: start over
+                part.reset()
+                return (
+                    self._download_segmented(url, part, progress, checksum)
+                    if resumed
+                    else None
+                )
+            if not resumed:
+                part.begin(probe.code, probe.headers)
+                part.received = 0
+        print(f"Downloading {url} in {len(pending)} segments")
+
+        lock = threading.Lock()
+        last_saved = time.monotonic()
+        progress.downloaded_bytes = sum(
+            segment[1] - segment[0] for segment in part.segments
+        )
+
+        def download_segment(segment: list[int], response) -> str:
+            attempt = 0
+            while True:
+                if response is None:
+                    result = self._request(
+                        url,
+                        headers=segment_headers(segment),
+                        stream=True,
+                        abort=abort,
+                        lane=Lane.BULK,
+                    )
+                    if result.outcome != RequestOutcome.OK:
+                        return result.outcome
+                    if not self._range_honoured(result, segment, size):
+                        # The remote file changed during the download
+                        result.response.close()
+                        return RequestOutcome.HTTP_ERROR
+                    response = result.response
+                position = segment[1]
+
+                def write(view: memoryview) -> None:
+                    nonlocal position
+                    while view:
+                        written = os.pwrite(fd, view, position)
+                        position += written
+                        view = view[written:]
+
+                def on_written(n: int) -> None:
+                    nonlocal last_saved
+                    with lock:
+                        segment[1] += n
+                        if (
+                            self._sync_interval
+                            and time.monotonic() - last_saved >= self._sync_interval
+                        ):
+                            # Only record bytes that are safely on disk
+                            os.fsync(fd)
+                            part.save()
+                            last_saved = time.monotonic()
+
+                try:
+                    with response:
+                        with WriteBehind(write, on_written, abort, progress) as writer:
+                            StreamWriter(
+                                progress.add_downloaded,
+                                abort,
+                                self.connection_pool.shaper,
+                            ).copy(
+                                response,
+                                writer.write,
+                                limit=segment[2] - segment[1] + 1,
+                            )
+                        if abort.is_set():
+                            return RequestOutcome.ABORTED
+                        if segment[1] <= segment[2]:
+                            raise http.client.IncompleteRead(
+                                b"", segment[2] - segment[1] + 1
+                            )
+                    return RequestOutcome.OK
+                except _TRANSIENT_ERRORS as e:
+                    print(f"Segment {segment[0]} of {url} interrupted at {segment[1]}: {e}")
+                    response = None
+                    if attempt < self._max_retries and self._backoff(attempt, abort):
+                        attempt += 1
+                        continue
+                    if abort.is_set():
+                        return RequestOutcome.ABORTED
+                    result = RequestResult(
+                        RequestOutcome.UNREACHABLE, None, None, None, None
+                    )
+                    self._classify(result)
+                    return result.outcome
+
+        fd = os.open(part.part_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            self._preallocate(fd, size)
+            part.save()
+            outcomes = []
+            if pending:
+                with ThreadPoolExecutor(
+                    max_workers=len(pending), thread_name_prefix="segment"
+                ) as executor:
+                    futures = [
+                        executor.submit(
+                            download_segment,
+                            segment,
+                            probe.response if i == 0 else None,
+                        )
+                        for i, segment in enumerate(pending)
+                    ]
+                    outcomes = [future.result() for future in futures]
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if abort.is_set() or RequestOutcome.ABORTED in outcomes:
+            part.discard()
+            return RequestOutcome.ABORTED
+        failed = [outcome for outcome in outcomes if outcome != RequestOutcome.OK]
+        if failed:
+            # Keep the finished ranges for the next attempt
+            part.save()
+            return failed[0]
+        print("Finalized download")
+        if checksum is not None:
+            checksum.reset()
+            checksum.update_from_file(part.part_path)
+            if not self._verify_part(part, checksum):
+                return RequestOutcome.CHECKSUM_MISMATCH
+        part.commit()
+        self._record_hashes(part.dest_path, checksum)
+        return RequestOutcome.OK
+
+    def queue_roms(self, roms: list[Rom]) -> None:
+        """
+        Add ROMs to the download queue: the running queue picks them up, or a
+        new one is started. Appended ROMs the card has no room for are dropped.
+        """
+        engine = self.engine
+        if engine is not None:
+            engine.queue(roms)
+            return
+        scheduler = self.status.download_scheduler
+        added, start = scheduler.add(roms)
+        if start:
+            self.status.download_rom_ready.clear()
+            threading.Thread(target=self.download_rom).start()
+            return
+        if not added:
+            return
+        shortfall = self._free_space_shortfall(scheduler.pending_roms())
+        if shortfall:
+            scheduler.remove(added)
+            self.status.report_download_error(shortfall)
+            return
+        self.queue_journal.queued(added)
+
+    def download_rom(self) -> None:
+        """
+        Download the ROMs of status.download_scheduler over DOWNLOAD_WORKERS
+        concurrent workers, in the order of its policy, while a separate worker
+        extracts multi-file ROMs already downloaded. ROMs queued meanwhile are
+        picked up before the queue ends. A failure stops workers from picking
+        new ROMs, an abort stops both stages and drops the zips waiting for
+        extraction. ROMs failing checksum verification go back to the end of
+        the queue. The queue is journaled: ROMs left pending by a failure are
+        picked up again by the next queue or launch, an abort drops them.
+        """
+        with self._download_session:
+            # The previous queue may have set these while winding down
+            self.status.abort_download.clear()
+            self.status.download_rom_ready.clear()
+            self._run_download_queue()
+
+    def _run_download_queue(self) -> None:
+        abort = self.status.abort_download
+        scheduler = self.status.download_scheduler
+        scheduler.add(self.queue_journal.load())
+        roms = scheduler.pending_roms()
+        shortfall = self._free_space_shortfall(roms)
+        if shortfall:
+            scheduler.stop(drop_pending=True)
+            self.status.report_download_error(shortfall)
+            self._reset_download_status(
+                self.status.valid_host, self.status.valid_credentials
+            )
+            return
+        self.queue_journal.start(roms)
+        checksum_failures: dict[int, int] = {}
+        self.status.download_error = None
+        failed = threading.Event()
+        # Bounded so downloads can't run far ahead of the SD card filling with zips
+        extract_queue: queue.Queue = queue.Queue(maxsize=self._extract_queue_size)
+
+        def extractor() -> None:
+            while True:
+                job = extract_queue.get()
+                if job is None:
                     return
+                item, download, dest_path = job
+                rom = item.rom
+                state = QueueState.FAILED
+                try:
+                    if abort.is_set():
+                        os.remove(dest_path)
+                        continue
+                    outcome = self._extract_rom(rom, download, dest_path)
+                    if outcome == RequestOutcome.OK:
+                        state = QueueState.DONE
+                        self.queue_journal.finished(rom)
+                        self._catalogue_rom(rom)
+                except Exception as e:
+                    # The extractor must live on, workers wait on its queue
+                    print(f"Error extracting {rom.name}: {e}")
+                    failed.set()
+                finally:
+                    scheduler.finish(item, state)
+                    self.status.finish_download(download)
+
+        def worker() -> None:
+            while not failed.is_set() and not abort.is_set():
+                item = scheduler.next()
+                if item is None:
+                    return
+                rom = item.rom
+                download = self.status.start_download(rom, item.position)
+                item.download = download
+                dest_path = self._rom_dest_path(rom)
+                if self.hash_index.matches(dest_path, rom):
+                    print(f"{rom.name} is already on the device, skipping")
+                    self.queue_journal.finished(rom)
+                    scheduler.finish(item)
+                    self.status.finish_download(download)
+                    continue
+                self.queue_journal.started(rom)
+                try:
+                    outcome = self._download_queued_rom(rom, download, dest_path)
+                except OSError as e:
+                    if e.errno == errno.ENOSPC:
+                        # Don't leave a preallocated part filling the card
+                        PartFile(dest_path, "").discard()
+                    self.status.report_download_error(
+                        f"Error writing {rom.name}: {e.strerror}"
+                    )
+                    scheduler.finish(item, QueueState.FAILED)
+                    self.status.finish_download(download)
+                    failed.set()
+                    continue
+                except Exception as e:
+                    # Raised in a pool thread it would go unseen, the item left active
+                    print(f"Error downloading {rom.name}: {e!r}")
+                    self.status.report_download_error(f"Error downloading {rom.name}")
+                    scheduler.finish(item, QueueState.FAILED)
+                    self.status.finish_download(download)
+                    failed.set()
+                    continue
+                if (
+                    outcome == RequestOutcome.OK
+                    and rom.has_multiple_files
+                    and not download.extracted
+                ):
+                    download.extract_pending = True
+                    while not abort.is_set():
+                        try:
+                            extract_queue.put((item, download, dest_path), timeout=0.5)
+                            break
+                        except queue.Full:
+                            continue
+                    else:
+                        os.remove(dest_path)
+                        scheduler.finish(item, QueueState.FAILED)
+                        self.status.finish_download(download)
+                    continue
+                if outcome == RequestOutcome.CHECKSUM_MISMATCH:
+                    checksum_failures[rom.id] = checksum_failures.get(rom.id, 0) + 1
+                    retry = checksum_failures[rom.id] <= self._checksum_retries
+                    if retry:
+                        scheduler.requeue(item)
+                    else:
+                        scheduler.finish(item, QueueState.FAILED)
+                        self.queue_journal.finished(rom)
+                        self.status.report_download_error(
+                            f"Checksum mismatch: {rom.name}"
+                        )
+                    self.status.finish_download(download, done=not retry)
+                    continue
+                if outcome not in (
+                    RequestOutcome.ABORTED,
+                    RequestOutcome.UNREACHABLE,
+                    RequestOutcome.SERVER_ERROR,
+                ):
+                    # Anything else won't go better on the next attempt
+                    self.queue_journal.finished(rom)
+                if outcome == RequestOutcome.OK:
+                    self._catalogue_rom(rom)
+                    scheduler.finish(item)
                 else:
-                    raise
-            except URLError:
-                self._reset_download_status(valid_host=True)
-                return
-        
-            # Check if the catalogue path is set and valid
-            try:
-                catalogue_path = self.file_system.get_catalogue_platform_path(
-                    rom.platform_slug
-                )
-            except ValueError:
-                catalogue_path = None
-            if not catalogue_path:
+                    scheduler.finish(item, QueueState.FAILED)
+                self.status.finish_download(download)
+                if outcome not in (RequestOutcome.OK, RequestOutcome.ABORTED):
+                    failed.set()
+
+        extraction = threading.Thread(target=extractor, name="extract")
+        extraction.start()
+        try:
+            while True:
+                with ThreadPoolExecutor(
+                    max_workers=self._download_workers, thread_name_prefix="download"
+                ) as executor:
+                    for _ in range(self._download_workers):
+                        executor.submit(worker)
+                if failed.is_set() or abort.is_set():
+                    scheduler.stop(drop_pending=abort.is_set())
+                    break
+                # Workers run out of items one by one, ROMs may have been queued since
+                if scheduler.stop_if_idle():
+                    break
+        finally:
+            extract_queue.put(None)
+            extraction.join()
+
+        if failed.is_set() and not abort.is_set():
+            # The journal keeps what's left for the next attempt
+            self._reset_download_status(
+                self.status.valid_host, self.status.valid_credentials
+            )
+            return
+        self.queue_journal.clear()
+        # End of download
+        self._reset_download_status(valid_host=True, valid_credentials=True)
+
+    def _free_space_shortfall(self, roms: list[Rom]) -> Optional[str]:
+        """
+        Sum the space the queue still needs on each card, leaving out ROMs
+        already on the device and bytes already in partial downloads, and
+        describe the first card that doesn't have it free.
+        Multi-file ROMs need room for their zip next to the extracted files,
+        the largest zip is counted once on top.
+        """
+        needed: dict[int, int] = {}
+        zips: dict[int, int] = {}
+        storage_paths: dict[int, str] = {}
+        for rom in roms:
+            dest_path = self._rom_dest_path(rom)
+            storage_path = os.path.dirname(os.path.abspath(dest_path))
+            while not os.path.exists(storage_path):
+                storage_path = os.path.dirname(storage_path)
+            device = os.stat(storage_path).st_dev
+            storage_paths.setdefault(device, storage_path)
+            if self.hash_index.matches(dest_path, rom):
                 continue
-            os.makedirs(catalogue_path, exist_ok=True)
-
-            filename = self._sanitize_filename(rom.fs_name_no_ext)
-            if rom.summary:
-                text_path = os.path.join(
-                    catalogue_path,
-                    "text",
-                    f"{filename}.txt",
+            size = rom.fs_size_bytes
+            if os.path.exists(f"{dest_path}.part"):
+                size = max(size - os.path.getsize(f"{dest_path}.part"), 0)
+            needed[device] = needed.get(device, 0) + size
+            if rom.has_multiple_files:
+                zips[device] = max(zips.get(device, 0), rom.fs_size_bytes)
+
+        for device, size in needed.items():
+            size += zips.get(device, 0)
+            free = shutil.disk_usage(storage_paths[device]).free
+            if size > free:
+                needed_size, needed_unit = self._human_readable_size(size)
+                free_size, free_unit = self._human_readable_size(free)
+                return (
+                    f"Not enough space in {storage_paths[device]}: "
+                    f"{needed_size} {needed_unit} needed, {free_size} {free_unit} free"
                 )
-                os.makedirs(os.path.dirname(text_path), exist_ok=True)
-                with open(text_path, "w") as f:
-                    f.write(rom.summary)
-                    f.write("\n\n")
-
-                    if rom.first_release_date:
-                        dt = datetime.datetime.fromtimestamp(
-                            rom.first_release_date / 1000
-                        )
-                        formatted_date = dt.strftime("%Y-%m-%d")
-                        f.write(f"First release date: {formatted_date}\n")
+        return None
 
-                    if rom.average_rating:
-                        f.write(f"Average rating: {rom.average_rating}\n")
+    @staticmethod
+    def _preallocate(fd: int, size: int) -> None:
+        """
+        Reserve the full size of a download up front, so the card gets written
+        contiguously instead of growing the file a chunk at a time.
+        Falls back to a plain truncate where the filesystem can't allocate.
+        """
+        if os.fstat(fd).st_size > size:
+            os.ftruncate(fd, size)
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except AttributeError:
+            os.ftruncate(fd, size)
+        except OSError as e:
+            if e.errno not in (errno.EOPNOTSUPP, errno.EINVAL, errno.ENOSYS):
+                raise
+            os.ftruncate(fd, size)
 
-                    if rom.genres:
-                        f.write(f"Genres: {', '.join(rom.genres)}\n")
+    def _rom_dest_path(self, rom: Rom) -> str:
+        return os.path.join(
+            self.file_system.get_platforms_storage_path(rom.platform_slug),
+            self._sanitize_filename(rom.fs_name),
+        )
 
-                    if rom.franchises:
-                        f.write(f"Franchises: {', '.join(rom.franchises)}\n")
+    def _download_queued_rom(
+        self, rom: Rom, download: DownloadProgress, dest_path: str
+    ) -> str:
+        url = f"{self.host}/{self._roms_endpoint}/{rom.id}/content/{quote(rom.fs_name)}?hidden_folder=true"
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
-                    if rom.companies:
-                        f.write(f"Companies: {', '.join(rom.companies)}\n")
+        # Server hashes describe the ROM file itself, not the zip of a multi-file ROM
+        checksum = None
+        if not rom.has_multiple_files:
+            checksum = StreamingChecksum(rom)
+            if not checksum.can_verify:
+                checksum = None
+
+        if rom.has_multiple_files:
+            print(f"Downloading and extracting {rom.name}")
+            outcome = self._selective_extract_rom(url, rom, download, dest_path)
+            if outcome is None:
+                outcome = self._stream_extract_rom(url, rom, download, dest_path)
+            if outcome is not None:
+                self._log_transfer(url, download, outcome)
+                download.extracted = True
+                return outcome
+            print(f"Downloading the zip of {rom.name} to extract it afterwards")
+
+        print(f"Downloading {rom.name} to {dest_path}")
+        return self._download_to_file(url, dest_path, download, checksum)
+
+    def _extract_rules(self, platform_slug: str) -> Tuple[list[str], list[str]]:
+        """Include and exclude patterns for the members of a platform's archives."""
+        include, exclude = self._extract_include, self._extract_exclude
+        return (
+            include.get("*", []) + include.get(platform_slug, []),
+            exclude.get("*", []) + exclude.get(platform_slug, []),
+        )
 
-            # Don't download covers and previews if the user disabled the option
-            if not self._download_assets:
-                continue
+    def _member_on_disk(self, file_path: str, member: RemoteMember) -> bool:
+        """Whether file_path already holds the member, by indexed CRC or size then CRC."""
+        # Extracted members are indexed with their CRC in the archive, an .m3u
+        # filtered since included
+        entry = self.hash_index.lookup(file_path)
+        if entry is not None and entry.crc:
+            return entry.crc == f"{member.crc:08x}"
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        if stat.st_size != member.size:
+            return False
+        crc = file_crc(file_path)
+        self.hash_index.record(file_path, f"{crc:08x}", stat=stat)
+        return crc == member.crc
+
+    def _selective_extract_rom(
+        self, url: str, rom: Rom, download: DownloadProgress, dest_path: str
+    ) -> Optional[str]:
+        """
+        Extract a multi-file ROM with Range requests, after reading the central
+        directory at the end of its zip. Members left out by the platform's
+        EXTRACT_INCLUDE/EXTRACT_EXCLUDE patterns, and those already on disk with
+        the same size and CRC, aren't transferred at all, so updating a
+        multi-disc set only fetches the discs that changed. Members close to each
+        other are fetched in a single range. Returns None when nothing is left
+        out, the whole archive then streams faster, when the server doesn't
+        serve ranges or when the archive can't be read this way.
+        """
+        abort = self.status.abort_download
+        dest_dir = os.path.dirname(dest_path)
+        failure = None
+        validator = None
+
+        def fetch(start: int, end: Optional[int]) -> Tuple[bytes, int]:
+            nonlocal failure, validator
+            byte_range = f"bytes={start}" if end is None else f"bytes={start}-{end - 1}"
+            headers = {"Range": byte_range}
+            if validator:
+                headers["If-Range"] = validator
+            result = self._request(
+                url, headers=headers, stream=True, abort=abort, lane=Lane.BULK
+            )
+            if result.outcome != RequestOutcome.OK:
+                failure = result.outcome
+                raise RangeNotSupported(f"{url} failed: {result.outcome}")
+            with result.response as response:
+                match = re.match(
+                    r"bytes (\d+)-", result.headers.get("Content-Range", "")
+                )
+                if result.code != 206 or not match:
+                    raise RangeNotSupported(f"No range support for {url}")
+                if validator is None:
+                    etag = result.headers.get("ETag")
+                    validator = (
+                        etag
+                        if etag and not etag.startswith("W/")
+                        else result.headers.get("Last-Modified")
+                    )
+                return response.read(), int(match.group(1))
 
-            box_path = os.path.join(catalogue_path, "box", f"{filename}.png")
-            preview_path = os.path.join(catalogue_path, "preview", f"{filename}.png")
+        try:
+            members = read_members(fetch)
+        except (RangeNotSupported, zipfile.BadZipFile, *_TRANSIENT_ERRORS) as e:
+            if failure is not None:
+                return RequestOutcome.ABORTED if abort.is_set() else failure
+            print(f"Reading the file list of {rom.name} failed: {e}")
+            return None
+        if not validator:
+            # Without one, members could come from a different archive
+            return None
+
+        include, exclude = self._extract_rules(rom.platform_slug)
+        wanted = []
+        left_out = False
+        for member in members:
+            file_path = os.path.join(dest_dir, self._sanitize_filename(member.name))
+            if member.name.endswith("/"):
+                os.makedirs(file_path, exist_ok=True)
+            elif not matches_rules(member.name, include, exclude):
+                print(f"Leaving out {member.name}")
+                left_out = True
+            elif self._member_on_disk(file_path, member):
+                print(f"{member.name} is already on the device, skipping")
+                left_out = True
+            elif not can_extract(member):
+                print(f"{member.name} can't be extracted from its range")
+                return None
+            else:
+                wanted.append(member)
+        if not left_out:
+            return None
 
-            # Download cover and preview images
-            os.makedirs(os.path.dirname(box_path), exist_ok=True)
-            os.makedirs(os.path.dirname(preview_path), exist_ok=True)
+        # Members are sorted by offset, each run is fetched in one range
+        runs: list[list[RemoteMember]] = []
+        for member in wanted:
+            if (
+                runs
+                and member.header_offset - runs[-1][-1].end_offset
+                <= self._range_merge_gap
+            ):
+                runs[-1].append(member)
+            else:
+                runs.append([member])
+        crcs = {
+            os.path.realpath(
+                os.path.join(dest_dir, self._sanitize_filename(member.name))
+            ): member.crc
+            for member in wanted
+        }
+
+        def on_member(path: str) -> None:
+            self._filter_m3u(path)
+            # Indexed once final, or a filtered .m3u would be fetched every time
+            self.hash_index.record(path, f"{crcs[path]:08x}")
+
+        # Members left out count as done
+        to_fetch = sum(run[-1].end_offset - run[0].header_offset for run in runs)
+        download.downloaded_bytes = max(download.total_bytes - to_fetch, 0)
+        extracted_bytes = 0
+        for run in runs:
+            unzip = StreamingUnzip(dest_dir, self._sanitize_filename, on_member, run)
+            received = 0
+            attempt = 0
+            while not unzip.finished:
+                start = run[0].header_offset + received
+                result = self._request(
+                    url,
+                    headers={
+                        "Range": f"bytes={start}-{run[-1].end_offset - 1}",
+                        "If-Range": validator,
+                    },
+                    stream=True,
+                    abort=abort,
+                    lane=Lane.BULK,
+                )
+                if result.outcome != RequestOutcome.OK:
+                    unzip.discard()
+                    return RequestOutcome.ABORTED if abort.is_set() else result.outcome
+                if result.code != 206 or not result.headers.get(
+                    "Content-Range", ""
+                ).startswith(f"bytes {start}-"):
+                    # The archive changed on the server
+                    result.response.close()
+                    unzip.discard()
+                    return None
+
+                def on_progress(
+                    n: int,
+                    extracted_bytes: int = extracted_bytes,
+                    unzip: StreamingUnzip = unzip,
+                ) -> None:
+                    nonlocal received
+                    received += n
+                    download.add_downloaded(n)
+                    # Add 1 virtual byte to avoid division by zero
+                    download.extracted_percent = (
+                        (extracted_bytes + unzip.extracted_bytes)
+                        / (download.total_bytes + 1)
+                    ) * 100
+
+                try:
+                    with (
+                        result.response as response,
+                        WriteBehind(unzip.feed, None, abort, download) as writer,
+                    ):
+                        StreamWriter(
+                            on_progress, abort, self.connection_pool.shaper
+                        ).copy(response, writer.write)
+                    if not abort.is_set() and not unzip.finished:
+                        raise http.client.IncompleteRead(b"")
+                except (StreamingUnsupported, zipfile.BadZipFile) as e:
+                    print(f"Extracting {rom.name} from its ranges failed: {e}")
+                    unzip.discard()
+                    return None
+                except _TRANSIENT_ERRORS as e:
+                    print(
+                        f"Download of {rom.name} interrupted at byte {start + received}: {e}"
+                    )
+                    if not abort.is_set():
+                        if attempt < self._max_retries and self._backoff(attempt, abort):
+                            attempt += 1
+                            continue
+                    if not abort.is_set():
+                        unzip.discard()
+                        result = RequestResult(
+                            RequestOutcome.UNREACHABLE, None, None, None, None
+                        )
+                        self._classify(result)
+                        return result.outcome
+                if abort.is_set():
+                    unzip.discard()
+                    return RequestOutcome.ABORTED
+            extracted_bytes += unzip.extracted_bytes
+        print(f"Extracted {rom.name} at {dest_dir}")
+        return RequestOutcome.OK
+
+    def _stream_extract_rom(
+        self, url: str, rom: Rom, download: DownloadProgress, dest_path: str
+    ) -> Optional[str]:
+        """
+        Extract a multi-file ROM while it downloads, without writing its zip.
+        After a dropped connection the transfer continues where it stopped if the
+        server allows it. Returns None, with nothing left behind but complete
+        members, when the archive needs the zip on disk to be extracted.
+        """
+        abort = self.status.abort_download
+        dest_dir = os.path.dirname(dest_path)
+        unzip = StreamingUnzip(dest_dir, self._sanitize_filename, self._filter_m3u)
+        received = 0
+        validator = None
+        attempt = 0
+        while True:
+            headers = (
+                {"Range": f"bytes={received}-", "If-Range": validator}
+                if received and validator
+                else {}
+            )
+            requested = time.monotonic()
+            result = self._request(
+                url, headers=headers, stream=True, abort=abort, lane=Lane.BULK
+            )
+            if result.outcome != RequestOutcome.OK:
+                unzip.discard()
+                return RequestOutcome.ABORTED if abort.is_set() else result.outcome
+            if download.ttfb is None:
+                download.ttfb = time.monotonic() - requested
+            content_range = result.headers.get("Content-Range", "")
+            if received and not (
+                result.code == 206 and content_range.startswith(f"bytes {received}-")
+            ):
+                # The whole archive again, extract it from the start
+                unzip.discard()
+                unzip = StreamingUnzip(
+                    dest_dir, self._sanitize_filename, self._filter_m3u
+                )
+                received = 0
+                download.downloaded_bytes = 0
+            etag = result.headers.get("ETag")
+            validator = (
+                etag
+                if etag and not etag.startswith("W/")
+                else result.headers.get("Last-Modified")
+            )
+
+            def on_progress(n: int, unzip: StreamingUnzip = unzip) -> None:
+                nonlocal received
+                received += n
+                download.add_downloaded(n)
+                # Add 1 virtual byte to avoid division by zero
+                download.extracted_percent = (
+                    unzip.extracted_bytes / (download.total_bytes + 1)
+                ) * 100
 
-            self.image_utils.process_assets(
-                fullscreen=self._fullscreen_assets,
-                cover_url=rom.path_cover_small,
-                screenshot_urls=rom.merged_screenshots,
-                box_path=box_path,
-                preview_path=preview_path,
-                headers=self.headers,
+            try:
+                with (
+                    result.response as response,
+                    WriteBehind(unzip.feed, None, abort, download) as writer,
+                ):
+                    StreamWriter(on_progress, abort, self.connection_pool.shaper).copy(
+                        response, writer.write
+                    )
+                if not abort.is_set() and not unzip.finished:
+                    # The server closed the connection before the end
+                    raise http.client.IncompleteRead(b"")
+            except (StreamingUnsupported, zipfile.BadZipFile) as e:
+                print(f"Streamed extraction of {rom.name} failed: {e}")
+                unzip.discard()
+                download.downloaded_bytes = 0
+                return None
+            except _TRANSIENT_ERRORS as e:
+                print(f"Download of {url} interrupted at {received} bytes: {e}")
+                if not abort.is_set():
+                    if attempt < self._max_retries and self._backoff(attempt, abort):
+                        attempt += 1
+                        continue
+                if not abort.is_set():
+                    unzip.discard()
+                    result = RequestResult(
+                        RequestOutcome.UNREACHABLE, None, None, None, None
+                    )
+                    self._classify(result)
+                    return result.outcome
+            if abort.is_set():
+                unzip.discard()
+                return RequestOutcome.ABORTED
+            print(f"Extracted {rom.name} at {dest_dir}")
+            return RequestOutcome.OK
+
+    @staticmethod
+    def _filter_m3u(file_path: str) -> None:
+        # Remove some files from m3u files
+        # sbi files are psx files for encrypted games
+        if not file_path.endswith(".m3u"):
+            return
+        ignored_extensions = [".sbi"]
+        with open(file_path, "r") as m3u_file:
+            lines = m3u_file.readlines()
+        with open(file_path, "w") as m3u_file:
+            for line in lines:
+                if not any(ext in line.lower() for ext in ignored_extensions):
+                    m3u_file.write(line)
+
+    def _extract_member(
+        self,
+        zip_ref: zipfile.ZipFile,
+        member: zipfile.ZipInfo,
+        file_path: str,
+        on_progress,
+        stop: threading.Event,
+    ) -> bool:
+        """Copy one member out of the zip, False if stopped before it was complete."""
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with zip_ref.open(member) as source, open(file_path, "wb") as target:
+            while not stop.is_set():
+                chunk = source.read(self._extract_chunk_size)
+                if not chunk:
+                    break
+                target.write(chunk)
+                on_progress(len(chunk))
+        if stop.is_set():
+            os.remove(file_path)
+            return False
+        self._filter_m3u(file_path)
+        return True
+
+    def _extract_rom(self, rom: Rom, download: DownloadProgress, dest_path: str) -> str:
+        """
+        Unpack a downloaded multi-file ROM next to its zip, then remove the zip.
+        Members are spread over a pool of threads, each with its own handle on
+        the zip since inflating releases the GIL, biggest first so a large disc
+        image doesn't end up extracting alone at the end.
+        """
+        download.extract_pending = False
+        download.extracting = True
+        try:
+            return self._extract_zip(rom, download, dest_path)
+        finally:
+            download.extracting = False
+
+    def _extract_zip(self, rom: Rom, download: DownloadProgress, dest_path: str) -> str:
+        print("Multi-file rom detected. Extracting...")
+        dest_dir = os.path.dirname(dest_path)
+        with zipfile.ZipFile(dest_path, "r") as zip_ref:
+            members = zip_ref.infolist()
+        files = []
+        for member in members:
+            file_path = os.path.join(dest_dir, self._sanitize_filename(member.filename))
+            if member.is_dir():
+                os.makedirs(file_path, exist_ok=True)
+            else:
+                files.append((member, file_path))
+        files.sort(key=lambda file: file[0].file_size, reverse=True)
+
+        total_size = sum(member.file_size for member, _ in files) or 1
+        extracted_size = 0
+        progress_lock = threading.Lock()
+
+        def on_progress(size: int) -> None:
+            nonlocal extracted_size
+            with progress_lock:
+                extracted_size += size
+                download.extracted_percent = (extracted_size / total_size) * 100
+
+        # Set on abort or on the first member that fails, stops the others mid-copy
+        stop = threading.Event()
+        handles: list[zipfile.ZipFile] = []
+        local = threading.local()
+
+        def extract(member: zipfile.ZipInfo, file_path: str) -> bool:
+            if stop.is_set():
+                return False
+            zip_ref = getattr(local, "zip_ref", None)
+            if zip_ref is None:
+                zip_ref = local.zip_ref = zipfile.ZipFile(dest_path, "r")
+                with progress_lock:
+                    handles.append(zip_ref)
+            try:
+                return self._extract_member(
+                    zip_ref, member, file_path, on_progress, stop
+                )
+            except BaseException:
+                stop.set()
+                raise
+
+        abort = self.status.abort_download
+        try:
+            with ThreadPoolExecutor(
+                max_workers=min(self._extract_workers, max(len(files), 1)),
+                thread_name_prefix="extract",
+            ) as executor:
+                futures = [executor.submit(extract, *file) for file in files]
+                while not all(future.done() for future in futures):
+                    if abort.wait(0.1):
+                        stop.set()
+                        # Leaving the pool waits for the members being copied
+                        break
+                for future in futures:
+                    future.result()
+        finally:
+            for zip_ref in handles:
+                zip_ref.close()
+        os.remove(dest_path)
+        if stop.is_set():
+            return RequestOutcome.ABORTED
+        print(f"Extracted {rom.name} at {dest_dir}")
+        return RequestOutcome.OK
+
+    def _catalogue_rom(self, rom: Rom) -> None:
+        """Write the ROM's description and artwork into the frontend's catalogue."""
+        # Check if the catalogue path is set and valid
+        try:
+            catalogue_path = self.file_system.get_catalogue_platform_path(
+                rom.platform_slug
             )
-        # End of download
-        self._reset_download_status(valid_host=True, valid_credentials=True)
+        except ValueError:
+            catalogue_path = None
+        if not catalogue_path:
+            return
+        os.makedirs(catalogue_path, exist_ok=True)
+
+        filename = self._sanitize_filename(rom.fs_name_no_ext)
+        if rom.summary:
+            text_path = os.path.join(
+                catalogue_path,
+                "text",
+                f"{filename}.txt",
+            )
+            os.makedirs(os.path.dirname(text_path), exist_ok=True)
+            with open(text_path, "w") as f:
+                f.write(rom.summary)
+                f.write("\n\n")
+
+                if rom.first_release_date:
+                    dt = datetime.datetime.fromtimestamp(
+                        rom.first_release_date / 1000
+                    )
+                    formatted_date = dt.strftime("%Y-%m-%d")
+                    f.write(f"First release date: {formatted_date}\n")
+
+                if rom.average_rating:
+                    f.write(f"Average rating: {rom.average_rating}\n")
+
+                if rom.genres:
+                    f.write(f"Genres: {', '.join(rom.genres)}\n")
+
+                if rom.franchises:
+                    f.write(f"Franchises: {', '.join(rom.franchises)}\n")
+
+                if rom.companies:
+                    f.write(f"Companies: {', '.join(rom.companies)}\n")
+
+        # Don't download covers and previews if the user disabled the option
+        if not self._download_assets:
+            return
+
+        box_path = os.path.join(catalogue_path, "box", f"{filename}.png")
+        preview_path = os.path.join(catalogue_path, "preview", f"{filename}.png")
+
+        # Download cover and preview images
+        os.makedirs(os.path.dirname(box_path), exist_ok=True)
+        os.makedirs(os.path.dirname(preview_path), exist_ok=True)
+
+        self.image_utils.process_assets(
+            fullscreen=self._fullscreen_assets,
+            cover_url=rom.path_cover_small,
+            screenshot_urls=rom.merged_screenshots,
+            box_path=box_path,
+            preview_path=preview_path,
+            headers=self.headers,
+        )
 
     def fetch_saves_states(self) -> None:
         endpoint = self._saves_endpoint
@@ -865,48 +2170,31 @@ class API:
         if self.status.selected_states_get:
             endpoint = self._states_endpoint
             fetch_type = "states"
-            
-            
-        print(f"Fetching {fetch_type}...")
-        try:
-            request = Request(
-                f"{self.host}/{endpoint}", headers=self.headers
-            )
-        except ValueError:
+
+        print(f"Requesting {fetch_type} from {self.host}/{endpoint}")
+        result = self._request(f"{self.host}/{endpoint}")
+        if result.outcome != RequestOutcome.OK:
             self.status.saves = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
+            self.status.saves_ready.set()
             return
-        print(f"Requesting {fetch_type} from {self.host}/{endpoint} / {self.headers}")
-        try:
-            if request.type not in ("http", "https"):
-                self.status.saves = []
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                return
-            response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
-        except HTTPError as e:
-            if e.code == 403:
-                self.status.saves = []
-                self.status.valid_host = True
-                self.status.valid_credentials = False
-                return
-            else:
-                raise
-        except URLError:
-            self.status.saves = []
-            self.status.valid_host = False
-            self.status.valid_credentials = False
-            return
-        saves = json.loads(response.read().decode("utf-8"))
+        saves = json.loads(result.body.decode("utf-8"))
         
         _saves = self._parse_saves_states(saves)
 
         self.status.saves = _saves
-        self.status.valid_host = True
-        self.status.valid_credentials = True
         self.status.saves_ready.set()
 
+    @staticmethod
+    def _apply_save_timestamp(dest_path: str, file_name: str) -> None:
+        # Get time from file name
+        _date_pattern = r"\[([0-9]{4}-[0-9]{1,2}-[0-9]{1,2} [0-9]{1,2}-[0-9]{1,2}).*\]"
+        _date = re.findall(_date_pattern, file_name)
+        # Convert to datetime object
+        if _date:
+            _file_dtime = datetime.datetime.strptime(_date[0], "%Y-%m-%d %H-%M")
+            # Set the access and modification datetime of the file
+            os.utime(dest_path, (_file_dtime.timestamp(), _file_dtime.timestamp()))
+
     def download_save_state(self) -> None:
         self.status.download_queue_saves.sort(key=lambda save: save.file_name)
         for i, save in enumerate(self.status.download_queue_saves):
@@ -921,65 +2209,23 @@ class API:
             url = f"{self.host}{quote(url_dlpath, safe='/?=[]:')}"
             os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
-            try:
-                print(f"Fetching: {url}")
-                request = Request(url, headers=self.headers)
-            except ValueError:
-                self._reset_download_status()
+            print(f"Downloading {save.file_name} to {dest_path}")
+            self.status.save_download = DownloadProgress(
+                save.file_name, save.file_name, save.file_size_bytes, i + 1
+            )
+            outcome = self._download_to_file(url, dest_path, self.status.save_download)
+            if outcome == RequestOutcome.ABORTED:
+                self._reset_download_status(True, True)
                 return
-            try:
-                if request.type not in ("http", "https"):
-                    self._reset_download_status()
-                    return
-                print(f"Downloading {save.file_name} to {dest_path}")
-                with (
-                    urlopen(request) as response,  # trunk-ignore(bandit/B310)
-                    open(dest_path, "wb") as out_file,
-                ):
-                    self.status.total_downloaded_bytes = 0
-                    chunk_size = 1024
-                    while True:
-                        if not self.status.abort_download.is_set():
-                            chunk = response.read(chunk_size)
-                            if not chunk:
-                                out_file.close()
-                                # Get time from file name
-                                _date_pattern = r"\[([0-9]{4}-[0-9]{1,2}-[0-9]{1,2} [0-9]{1,2}-[0-9]{1,2}).*\]"
-                                _date = re.findall(_date_pattern, save.file_name)
-                                # Convert to datetime object
-                                if _date:
-                                    _file_dtime = datetime.datetime.strptime(_date[0], "%Y-%m-%d %H-%M")
-                                    # Set the access and modification datetime of the file
-                                    os.utime(dest_path, (_file_dtime.timestamp(), _file_dtime.timestamp()))
-                                print("Finalized download")
-                                if save.screenshot:
-                                    print("Downloading screenshot...")
-                                    self.download_screenshot(save)
-                                break
-                            out_file.write(chunk)
-                            self.status.valid_host = True
-                            self.status.valid_credentials = True
-                            self.status.total_downloaded_bytes += len(chunk)
-                            self.status.downloaded_percent = (
-                                self.status.total_downloaded_bytes
-                                / (
-                                    self.status.downloading_save.file_size_bytes + 1
-                                )  # Add 1 virtual byte to avoid division by zero
-                            ) * 100
-                        else:
-                            self._reset_download_status(True, True)
-                            os.remove(dest_path)
-                            return
-                        
-            except HTTPError as e:
-                if e.code == 403:
-                    self._reset_download_status(valid_host=True)
-                    return
-                else:
-                    raise
-            except URLError:
-                self._reset_download_status(valid_host=True)
+            if outcome != RequestOutcome.OK:
+                self._reset_download_status(
+                    self.status.valid_host, self.status.valid_credentials
+                )
                 return
+            self._apply_save_timestamp(dest_path, save.file_name)
+            if save.screenshot:
+                print("Downloading screenshot...")
+                self.download_screenshot(save)
         # End of download
         self._reset_download_status(valid_host=True, valid_credentials=True)
 
@@ -1001,63 +2247,23 @@ class API:
         url = f"{self.host}{quote(url_dlpath, safe='/?=[]:')}"
         os.makedirs(os.path.dirname(dest_path), exist_ok=True)
 
-        try:
-            print(f"Fetching: {url}")
-            request = Request(url, headers=self.headers)
-        except ValueError:
-            self._reset_download_status()
+        print(f"Downloading {screenshot.file_name} to {dest_path}")
+        outcome = self._download_to_file(
+            url,
+            dest_path,
+            DownloadProgress(
+                screenshot.file_name, screenshot.file_name, screenshot.file_size_bytes
+            ),
+        )
+        if outcome == RequestOutcome.ABORTED:
+            self._reset_download_status(True, True)
             return
-        try:
-            if request.type not in ("http", "https"):
-                self._reset_download_status()
-                return
-            print(f"Downloading {screenshot.file_name} to {dest_path}")
-            with (
-                urlopen(request) as response,  # trunk-ignore(bandit/B310)
-                open(dest_path, "wb") as out_file,
-            ):
-                self.status.total_downloaded_bytes = 0
-                chunk_size = 1024
-                while True:
-                    if not self.status.abort_download.is_set():
-                        chunk = response.read(chunk_size)
-                        if not chunk:
-                            out_file.close()
-                            # Get time from file name
-                            _date_pattern = r"\[([0-9]{4}-[0-9]{1,2}-[0-9]{1,2} [0-9]{1,2}-[0-9]{1,2}).*\]"
-                            _date = re.findall(_date_pattern, save.file_name)
-                            # Convert to datetime object
-                            if _date:
-                                _file_dtime = datetime.datetime.strptime(_date[0], "%Y-%m-%d %H-%M")
-                                # Set the access and modification datetime of the file
-                                os.utime(dest_path, (_file_dtime.timestamp(), _file_dtime.timestamp()))
-                            print("Finalized download")
-                            break
-                        out_file.write(chunk)
-                        self.status.valid_host = True
-                        self.status.valid_credentials = True
-                        self.status.total_downloaded_bytes += len(chunk)
-                        self.status.downloaded_percent = (
-                            self.status.total_downloaded_bytes
-                            / (
-                                self.status.downloading_save.file_size_bytes + 1
-                            )  # Add 1 virtual byte to avoid division by zero
-                        ) * 100
-                    else:
-                        self._reset_download_status(True, True)
-                        os.remove(dest_path)
-                        return
-                    
-        except HTTPError as e:
-            if e.code == 403:
-                self._reset_download_status(valid_host=True)
-                return
-            else:
-                raise
-        except URLError:
-            self._reset_download_status(valid_host=True)
+        if outcome != RequestOutcome.OK:
+            self._reset_download_status(
+                self.status.valid_host, self.status.valid_credentials
+            )
             return
-        # End of download
+        self._apply_save_timestamp(dest_path, save.file_name)
 
     def upload_save_state(self, rom: Rom, emulator: str) -> None:
         '''
@@ -1158,39 +2364,19 @@ class API:
                     "screenshotFile", os.path.splitext(_file_name_tag)[0] + ".png",
                     fileHandle=open(_file + '.png', 'rb'))
             data = bytes(form)
-            try:
-                request = Request(
-                                url,
-                                headers=self.headers,
-                                data=data,)
-            except ValueError as e:
-                print(e)
-                self.status.valid_host = False
-                self.status.valid_credentials = False
-                break
-            
-            request.add_header('Content-type', form.get_content_type())
-            request.add_header('Content-length', str(len(data)))
-            
-            try:
-                if request.type not in ("http", "https"):
-                    self.status.valid_host = False
-                    self.status.valid_credentials = False
-                    break
-                response = urlopen(request, timeout=60)  # trunk-ignore(bandit/B310)
-            except HTTPError as e:
-                print(e)
-                if e.code == 403:
-                    self.status.valid_host = True
-                    self.status.valid_credentials = False
-                    break
-                else:
-                    self.status.save_upload_ready.set()
-                    raise
-            except URLError as e:
-                print(e)
-                self.status.valid_host = False
-                self.status.valid_credentials = False
+            # Uploads are not idempotent, a retry could store the same state twice
+            result = self._request(
+                url,
+                method="POST",
+                data=data,
+                headers={
+                    "Content-type": form.get_content_type(),
+                    "Content-length": str(len(data)),
+                },
+                retries=0,
+                lane=Lane.BULK,
+            )
+            if result.outcome != RequestOutcome.OK:
                 break
             print(f"Uploaded {os.path.basename(_file)} successfully. Server name: {_file_name_tag}")
         self.status.save_upload_ready.set()
@@ -0,0 +1,103 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class Lane:
+    # Browsing: metadata, ROM info, icons and covers
+    INTERACTIVE = "interactive"
+    # ROM, save and screenshot downloads
+    BULK = "bulk"
+
+
+class BandwidthShaper:
+    """
+    Token bucket shared by every bulk transfer, so downloads can be capped to
+    `rate` bytes per second (0 for no limit) and slow down to `backoff_rate`
+    while any interactive request is in flight, leaving the link to browsing.
+    Bulk readers ask for permission before each read and get at most a tenth
+    of a second worth of bytes, so a backoff takes effect almost at once.
+    With bulk transfers in another process, `share_interactive` tells that
+    process's shaper, through `external_interactive`, about the requests here.
+    """
+
+    backoff_rate = 64 * 1024  # bytes per second
+    burst = 0.5  # seconds worth of bytes that can pile up in the bucket
+    min_grant = 4096  # bytes
+
+    def __init__(self, rate: int = 0) -> None:
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._tokens = 0.0
+        self._last_refill = time.monotonic()
+        self._interactive = 0
+        self._on_interactive: Optional[Callable[[int], None]] = None
+        # Count of the interactive requests of another process sharing the link
+        self.external_interactive: Optional[Callable[[], int]] = None
+
+    def share_interactive(
+        self, on_interactive: Optional[Callable[[int], None]]
+    ) -> None:
+        """Call on_interactive with the count in flight now and on every change, None to stop."""
+        with self._lock:
+            self._on_interactive = on_interactive
+            if on_interactive is not None:
+                on_interactive(self._interactive)
+
+    def begin_interactive(self) -> None:
+        with self._lock:
+            self._interactive += 1
+            if self._on_interactive is not None:
+                self._on_interactive(self._interactive)
+
+    def end_interactive(self) -> None:
+        with self._lock:
+            self._interactive = max(self._interactive - 1, 0)
+            if self._on_interactive is not None:
+                self._on_interactive(self._interactive)
+
+    def _interactive_count(self) -> int:
+        if self.external_interactive is None:
+            return self._interactive
+        return self._interactive + self.external_interactive()
+
+    @property
+    def interactive_in_flight(self) -> bool:
+        return self._interactive_count() > 0
+
+    def _current_rate(self) -> int:
+        if self._interactive_count():
+            return min(self.rate, self.backoff_rate) if self.rate else self.backoff_rate
+        return self.rate
+
+    def _refill(self, rate: int, grant: int) -> None:
+        now = time.monotonic()
+        capacity = max(rate * self.burst, grant)
+        self._tokens = min(self._tokens + (now - self._last_refill) * rate, capacity)
+        self._last_refill = now
+
+    def acquire(self, size: int, abort: Optional[threading.Event] = None) -> int:
+        """
+        Wait until some of `size` bytes may be read and return how many.
+        Bytes granted but not read should be handed back with refund().
+        """
+        while True:
+            with self._lock:
+                rate = self._current_rate()
+                if not rate:
+                    self._last_refill = time.monotonic()
+                    return size
+                grant = min(size, max(rate // 10, self.min_grant))
+                self._refill(rate, grant)
+                if self._tokens >= grant:
+                    self._tokens -= grant
+                    return grant
+                wait = (grant - self._tokens) / rate
+            if abort is not None and abort.is_set():
+                return grant
+            # Short naps, so the end of an interactive request is noticed quickly
+            time.sleep(min(wait, 0.1))
+
+    def refund(self, size: int) -> None:
+        with self._lock:
+            self._tokens += size
@@ -0,0 +1,156 @@
+import json
+import os
+import sqlite3
+import threading
+
+from models import Collection, Platform, Rom, rom_from_row
+from status import View
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS platforms (
+    id INTEGER PRIMARY KEY,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS collections (
+    id TEXT NOT NULL,
+    virtual INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (id, virtual)
+);
+CREATE TABLE IF NOT EXISTS roms (
+    id INTEGER PRIMARY KEY,
+    platform_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS collection_roms (
+    collection_id TEXT NOT NULL,
+    virtual INTEGER NOT NULL,
+    rom_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (collection_id, virtual, rom_id)
+);
+CREATE INDEX IF NOT EXISTS roms_platform_name ON roms (platform_id, name);
+CREATE INDEX IF NOT EXISTS roms_name ON roms (name);
+CREATE INDEX IF NOT EXISTS collection_roms_position
+    ON collection_roms (collection_id, virtual, position);
+"""
+
+
+class Catalog:
+    """
+    Local SQLite copy of the platforms, collections and ROMs last shown,
+    so the views can be browsed at launch and while the server is unreachable.
+    """
+
+    def __init__(self, owner: str) -> None:
+        self.catalog_path = os.path.join(os.getcwd(), "cache", "catalog.db")
+        os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.catalog_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+            row = self._db.execute(
+                "SELECT value FROM meta WHERE key = 'owner'"
+            ).fetchone()
+            # Data cached for another server or user must never be shown
+            if row is None or row[0] != owner:
+                for table in ("platforms", "collections", "roms", "collection_roms"):
+                    self._db.execute(
+                        f"DELETE FROM {table}"  # trunk-ignore(bandit/B608)
+                    )
+                self._db.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('owner', ?)",
+                    (owner,),
+                )
+
+    def load_platforms(self) -> list[Platform]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM platforms ORDER BY position"
+            ).fetchall()
+        return [Platform._make(json.loads(data)) for (data,) in rows]
+
+    def save_platforms(self, platforms: list[Platform]) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM platforms")
+            self._db.executemany(
+                "INSERT INTO platforms (id, position, data) VALUES (?, ?, ?)",
+                [(p.id, i, json.dumps(list(p))) for i, p in enumerate(platforms)],
+            )
+
+    def load_collections(self) -> list[Collection]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM collections ORDER BY position"
+            ).fetchall()
+        return [Collection._make(json.loads(data)) for (data,) in rows]
+
+    def save_collections(self, collections: list[Collection]) -> None:
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM collections")
+            self._db.executemany(
+                "INSERT INTO collections (id, virtual, position, data) VALUES (?, ?, ?, ?)",
+                [
+                    (str(c.id), int(c.virtual), i, json.dumps(list(c)))
+                    for i, c in enumerate(collections)
+                ],
+            )
+
+    def load_roms(self, view: str, id) -> list[Rom]:
+        """Return the ROMs last shown for a platform or (virtual) collection."""
+        with self._lock:
+            if view == View.PLATFORMS:
+                rows = self._db.execute(
+                    "SELECT data FROM roms WHERE platform_id = ? ORDER BY name",
+                    (id,),
+                ).fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT roms.data FROM collection_roms "
+                    "JOIN roms ON roms.id = collection_roms.rom_id "
+                    "WHERE collection_id = ? AND virtual = ? ORDER BY position",
+                    (str(id), int(view == View.VIRTUAL_COLLECTIONS)),
+                ).fetchall()
+        return [rom_from_row(json.loads(data)) for (data,) in rows]
+
+    def save_roms(self, view: str, id, roms: list[Rom]) -> None:
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO roms (id, platform_id, name, data) VALUES (?, ?, ?, ?)",
+                [(r.id, r.platform_id, r.name, json.dumps(list(r))) for r in roms],
+            )
+            if view == View.PLATFORMS:
+                # Forget ROMs removed from the platform on the server
+                stale = {
+                    rom_id
+                    for (rom_id,) in self._db.execute(
+                        "SELECT id FROM roms WHERE platform_id = ?", (id,)
+                    )
+                } - {r.id for r in roms}
+                self._db.executemany(
+                    "DELETE FROM roms WHERE id = ?", [(rom_id,) for rom_id in stale]
+                )
+            else:
+                virtual = int(view == View.VIRTUAL_COLLECTIONS)
+                self._db.execute(
+                    "DELETE FROM collection_roms WHERE collection_id = ? AND virtual = ?",
+                    (str(id), virtual),
+                )
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO collection_roms "
+                    "(collection_id, virtual, rom_id, position) VALUES (?, ?, ?, ?)",
+                    [(str(id), virtual, r.id, i) for i, r in enumerate(roms)],
+                )
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
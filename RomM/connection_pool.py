@@ -0,0 +1,355 @@
+import http.client
+import io
+import select
+import ssl
+import sys
+import threading
+import time
+from typing import Callable, Optional
+from urllib.error import HTTPError, URLError
+from urllib.parse import urljoin, urlsplit
+from urllib.request import Request
+
+from bandwidth import BandwidthShaper, Lane
+
+# Errors raised when a kept-alive socket was closed by the server while idle
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+_REDIRECT_CODES = (301, 302, 303, 307, 308)
+_IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+    """HTTPS connection that resumes the TLS session last negotiated with its host."""
+
+    def __init__(self, pool: "ConnectionPool", key: tuple, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._pool = pool
+        self._pool_key = key
+
+    def connect(self) -> None:
+        http.client.HTTPConnection.connect(self)
+        self.sock = self._context.wrap_socket(
+            self.sock,
+            server_hostname=self.host,
+            session=self._pool._get_tls_session(self._pool_key[:3]),
+        )
+
+
+class PooledResponse:
+    """File-like wrapper that hands its connection back to the pool once drained."""
+
+    def __init__(
+        self,
+        pool: "ConnectionPool",
+        key: tuple,
+        connection: http.client.HTTPConnection,
+        response: http.client.HTTPResponse,
+        url: str,
+    ) -> None:
+        self._pool = pool
+        self._key = key
+        self._connection: Optional[http.client.HTTPConnection] = connection
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.code = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+        # Called once when the response is closed or fully read
+        self.on_done: Optional[Callable[[], None]] = None
+
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._response.getheader(name, default)
+
+    def geturl(self) -> str:
+        return self.url
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        data = self._response.read(amt)
+        if self._response.isclosed():
+            self._release()
+        return data
+
+    def readinto(self, b) -> int:
+        n = self._response.readinto(b)
+        if self._response.isclosed():
+            self._release()
+        return n
+
+    def close(self) -> None:
+        self._done()
+        if self._connection is None:
+            return
+        if self._response.isclosed():
+            self._release()
+        else:
+            # Unread body left on the socket, the connection can't be reused
+            self._response.close()
+            self._connection.close()
+            self._connection = None
+
+    def _done(self) -> None:
+        if self.on_done is not None:
+            on_done, self.on_done = self.on_done, None
+            on_done()
+
+    def _release(self) -> None:
+        self._done()
+        if self._connection is None:
+            return
+        connection = self._connection
+        self._connection = None
+        if self._response.will_close:
+            connection.close()
+        else:
+            self._pool._put(self._key, connection)
+
+    def __enter__(self) -> "PooledResponse":
+        return self
+
+    def __exit__(self, *_exc) -> None:
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of persistent HTTP(S) connections keyed by host and lane.
+    Interactive and bulk requests never share connections, and bulk transfers
+    back off through the shaper while an interactive request is in flight.
+    """
+
+    _instance: Optional["ConnectionPool"] = None
+    _initialized: bool = False
+
+    max_idle_per_host = 4
+    max_idle_total = 16
+    idle_timeout = 30.0
+    max_redirects = 5
+    user_agent = "Python-urllib/%d.%d" % sys.version_info[:2]
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ConnectionPool, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self._lock = threading.Lock()
+        self._idle: dict[tuple, list[tuple[http.client.HTTPConnection, float]]] = {}
+        self._tls_sessions: dict[tuple, ssl.SSLSession] = {}
+        self._ssl_context = ssl.create_default_context()
+        self.shaper = BandwidthShaper()
+        self._initialized = True
+
+    @staticmethod
+    def _pool_key(url: str) -> tuple:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"unknown url type: {url!r}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        return (parts.scheme, parts.hostname, port)
+
+    def _get_tls_session(self, key: tuple) -> Optional[ssl.SSLSession]:
+        with self._lock:
+            return self._tls_sessions.get(key)
+
+    def _new_connection(
+        self, key: tuple, timeout: Optional[float]
+    ) -> http.client.HTTPConnection:
+        scheme, host, port = key[:3]
+        if scheme == "https":
+            return _HTTPSConnection(
+                self, key, host, port, timeout=timeout, context=self._ssl_context
+            )
+        return http.client.HTTPConnection(host, port, timeout=timeout)
+
+    @staticmethod
+    def _is_alive(connection: http.client.HTTPConnection) -> bool:
+        # An idle keep-alive socket only becomes readable when the server closed it
+        if connection.sock is None:
+            return False
+        try:
+            readable, _, _ = select.select([connection.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _evict_expired(self, now: float) -> None:
+        for key in list(self._idle):
+            alive = []
+            for connection, last_used in self._idle[key]:
+                if now - last_used > self.idle_timeout:
+                    connection.close()
+                else:
+                    alive.append((connection, last_used))
+            if alive:
+                self._idle[key] = alive
+            else:
+                del self._idle[key]
+
+    def _get(
+        self, key: tuple, timeout: Optional[float]
+    ) -> tuple[http.client.HTTPConnection, bool]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_expired(now)
+            idle = self._idle.get(key, [])
+            while idle:
+                connection, _ = idle.pop()
+                if self._is_alive(connection):
+                    connection.timeout = timeout
+                    if connection.sock is not None:
+                        connection.sock.settimeout(timeout)
+                    return connection, True
+                connection.close()
+        return self._new_connection(key, timeout), False
+
+    def _put(self, key: tuple, connection: http.client.HTTPConnection) -> None:
+        if connection.sock is None:
+            return
+        session = getattr(connection.sock, "session", None)
+        now = time.monotonic()
+        with self._lock:
+            if session is not None:
+                # Both lanes resume the same TLS session
+                self._tls_sessions[key[:3]] = session
+            self._evict_expired(now)
+            idle = self._idle.setdefault(key, [])
+            total = sum(len(conns) for conns in self._idle.values())
+            if len(idle) >= self.max_idle_per_host or total >= self.max_idle_total:
+                connection.close()
+                return
+            idle.append((connection, now))
+
+    def clear(self) -> None:
+        """Close every idle connection and forget cached TLS sessions."""
+        with self._lock:
+            for conns in self._idle.values():
+                for connection, _ in conns:
+                    connection.close()
+            self._idle.clear()
+            self._tls_sessions.clear()
+
+    def _send(
+        self,
+        method: str,
+        url: str,
+        headers: dict,
+        body: Optional[bytes],
+        timeout: Optional[float],
+        lane: str,
+    ) -> PooledResponse:
+        key = self._pool_key(url) + (lane,)
+        parts = urlsplit(url)
+        target = parts.path or "/"
+        if parts.query:
+            target += f"?{parts.query}"
+
+        while True:
+            connection, reused = self._get(key, timeout)
+            try:
+                connection.request(method, target, body=body, headers=headers)
+                response = connection.getresponse()
+            except _STALE_CONNECTION_ERRORS as e:
+                connection.close()
+                if reused and method in _IDEMPOTENT_METHODS:
+                    # The server dropped the idle socket, retry on a fresh one
+                    continue
+                raise URLError(e) from e
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise URLError(e) from e
+            return PooledResponse(self, key, connection, response, url)
+
+    def request(
+        self,
+        url: str,
+        method: str = "GET",
+        headers: Optional[dict] = None,
+        body: Optional[bytes] = None,
+        timeout: Optional[float] = None,
+        lane: str = Lane.INTERACTIVE,
+    ) -> PooledResponse:
+        """
+        Perform a request over a pooled connection of the given lane, following
+        redirects. Raises HTTPError for 4xx/5xx answers and URLError for network
+        failures, just like urllib.request.urlopen.
+        Interactive requests count as in flight until their response is closed.
+        """
+        interactive = lane == Lane.INTERACTIVE
+        if interactive:
+            self.shaper.begin_interactive()
+        try:
+            response = self._request(method, url, headers, body, timeout, lane)
+        except BaseException:
+            if interactive:
+                self.shaper.end_interactive()
+            raise
+        if interactive:
+            response.on_done = self.shaper.end_interactive
+        return response
+
+    def _request(
+        self,
+        method: str,
+        url: str,
+        headers: Optional[dict],
+        body: Optional[bytes],
+        timeout: Optional[float],
+        lane: str,
+    ) -> PooledResponse:
+        request_headers = {"User-Agent": self.user_agent}
+        request_headers.update(headers or {})
+
+        for _ in range(self.max_redirects + 1):
+            response = self._send(method, url, request_headers, body, timeout, lane)
+            location = response.getheader("Location")
+            if response.status in _REDIRECT_CODES and location:
+                response.read()
+                response.close()
+                url = urljoin(url, location)
+                if response.status == 303 or (
+                    response.status in (301, 302) and method == "POST"
+                ):
+                    method, body = "GET", None
+                    request_headers.pop("Content-type", None)
+                    request_headers.pop("Content-length", None)
+                continue
+            if response.status >= 400:
+                try:
+                    error_body = response.read()
+                except (OSError, http.client.HTTPException):
+                    error_body = b""
+                response.close()
+                raise HTTPError(
+                    url,
+                    response.status,
+                    response.reason,
+                    response.headers,
+                    io.BytesIO(error_body),
+                )
+            return response
+        raise URLError(f"Too many redirects: {url}")
+
+    def urlopen(
+        self,
+        request: Request,
+        timeout: Optional[float] = None,
+        lane: str = Lane.INTERACTIVE,
+    ) -> PooledResponse:
+        """Drop-in replacement for urllib.request.urlopen using pooled connections."""
+        return self.request(
+            request.full_url,
+            method=request.get_method(),
+            headers=dict(request.header_items()),
+            body=request.data,
+            timeout=timeout,
+            lane=lane,
+        )
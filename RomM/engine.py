@@ -0,0 +1,571 @@
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+import time
+from collections import namedtuple
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Optional
+
+from bandwidth import BandwidthShaper
+from models import Rom, rom_from_row
+from scheduler import QueueItem, QueuePolicy, QueueState
+
+_SEQUENCE = struct.Struct("<Q")
+_HEADER = struct.Struct("<QQBBHHIIQQI128s")
+_ACTIVE = struct.Struct("<QIQQdddBB")
+_ITEM = struct.Struct("<QBI")
+_MAX_ACTIVE = 16
+_MAX_ITEMS = 1024
+_SIZE = _HEADER.size + _MAX_ACTIVE * _ACTIVE.size + _MAX_ITEMS * _ITEM.size
+# After the progress, written by the UI only: its interactive requests in flight
+_INTERACTIVE = struct.Struct("<I")
+_STATES = (QueueState.PENDING, QueueState.ACTIVE, QueueState.DONE, QueueState.FAILED)
+
+EngineSnapshot = namedtuple(
+    "EngineSnapshot",
+    [
+        "commands_done",
+        "running",
+        "policy",
+        "finished_downloads",
+        "finished_bytes",
+        "total_bytes",
+        "total_count",
+        "error_count",
+        "error",
+        "active",
+        "items",
+    ],
+)
+# eta is negative while unknown
+ActiveSlot = namedtuple(
+    "ActiveSlot",
+    [
+        "rom_id",
+        "position",
+        "total_bytes",
+        "downloaded_bytes",
+        "extracted_percent",
+        "rate",
+        "eta",
+        "extract_pending",
+        "extracting",
+    ],
+)
+ItemSlot = namedtuple("ItemSlot", ["rom_id", "state", "position"])
+
+
+class EngineProgress:
+    """
+    Progress of the download engine in a block of shared memory, written by
+    the engine process only and read by the UI without any lock. The writer
+    makes the sequence number odd while it writes, readers start over when
+    it was odd or changed while they copied the block.
+    The block ends with the count of interactive requests the UI has in
+    flight, for the engine's bulk downloads to back off meanwhile.
+    """
+
+    read_attempts = 10
+
+    def __init__(self, name: Optional[str] = None) -> None:
+        if name is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=_SIZE + _INTERACTIVE.size
+            )
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # Attaching registers the block with this process' tracker, which
+            # would remove it when the engine exits, from under the UI
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        self.name = self._shm.name
+
+    def clear(self) -> None:
+        self._shm.buf[:_SIZE] = bytes(_SIZE)
+
+    def set_interactive(self, count: int) -> None:
+        _INTERACTIVE.pack_into(self._shm.buf, _SIZE, count)
+
+    def interactive(self) -> int:
+        return _INTERACTIVE.unpack_from(self._shm.buf, _SIZE)[0]
+
+    def publish(
+        self,
+        commands_done: int,
+        running: bool,
+        policy: str,
+        finished_downloads: int,
+        finished_bytes: int,
+        total_bytes: int,
+        total_count: int,
+        error_count: int,
+        error: str,
+        active: list[ActiveSlot],
+        items: list[ItemSlot],
+    ) -> None:
+        buf = self._shm.buf
+        active = active[:_MAX_ACTIVE]
+        # Finished items come last and are the first left out. total_count
+        # still counts them all, for the UI to tell how many aren't shown
+        items = items[:_MAX_ITEMS]
+        (sequence,) = _SEQUENCE.unpack_from(buf)
+        sequence += 1 if sequence % 2 == 0 else 2
+        _SEQUENCE.pack_into(buf, 0, sequence)
+        _HEADER.pack_into(
+            buf,
+            0,
+            sequence,
+            commands_done,
+            running,
+            QueuePolicy.ALL.index(policy),
+            len(active),
+            len(items),
+            finished_downloads,
+            error_count,
+            finished_bytes,
+            total_bytes,
+            total_count,
+            error.encode("utf-8")[:128],
+        )
+        offset = _HEADER.size
+        for slot in active:
+            _ACTIVE.pack_into(buf, offset, *slot)
+            offset += _ACTIVE.size
+        offset = _HEADER.size + _MAX_ACTIVE * _ACTIVE.size
+        for slot in items:
+            _ITEM.pack_into(
+                buf, offset, slot.rom_id, _STATES.index(slot.state), slot.position
+            )
+            offset += _ITEM.size
+        _SEQUENCE.pack_into(buf, 0, sequence + 1)
+
+    def read(self) -> Optional[EngineSnapshot]:
+        """The last progress published, None if there's none yet or it kept changing."""
+        buf = self._shm.buf
+        for _ in range(self.read_attempts):
+            (sequence,) = _SEQUENCE.unpack_from(buf)
+            if sequence == 0:
+                return None
+            if sequence % 2:
+                time.sleep(0)
+                continue
+            data = bytes(buf[:_SIZE])
+            if _SEQUENCE.unpack_from(buf)[0] != sequence:
+                continue
+            break
+        else:
+            return None
+        (
+            _,
+            commands_done,
+            running,
+            policy,
+            n_active,
+            n_items,
+            finished_downloads,
+            error_count,
+            finished_bytes,
+            total_bytes,
+            total_count,
+            error,
+        ) = _HEADER.unpack_from(data)
+        active = [
+            ActiveSlot._make(_ACTIVE.unpack_from(data, _HEADER.size + i * _ACTIVE.size))
+            for i in range(n_active)
+        ]
+        items_offset = _HEADER.size + _MAX_ACTIVE * _ACTIVE.size
+        items = []
+        for i in range(n_items):
+            rom_id, state, position = _ITEM.unpack_from(
+                data, items_offset + i * _ITEM.size
+            )
+            items.append(ItemSlot(rom_id, _STATES[state], position))
+        return EngineSnapshot(
+            commands_done,
+            bool(running),
+            QueuePolicy.ALL[policy],
+            finished_downloads,
+            finished_bytes,
+            total_bytes,
+            total_count,
+            error_count,
+            error.rstrip(b"\0").decode("utf-8", "replace"),
+            active,
+            items,
+        )
+
+    def close(self, unlink: bool = False) -> None:
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+
+
+class EngineDownload:
+    """A download of the engine as last published, with what the UI reads of it."""
+
+    def __init__(self, rom: Optional[Rom], slot: ActiveSlot) -> None:
+        self.name = rom.name if rom else f"ROM {slot.rom_id}"
+        self.file_name = rom.fs_name if rom else ""
+        self.position = slot.position
+        self.total_bytes = slot.total_bytes
+        self.downloaded_bytes = slot.downloaded_bytes
+        self.extracted_percent = slot.extracted_percent
+        self.rate = slot.rate
+        self.eta = slot.eta if slot.eta >= 0 else None
+        self.extract_pending = bool(slot.extract_pending)
+        self.extracting = bool(slot.extracting)
+
+    @property
+    def downloaded_percent(self) -> float:
+        # Add 1 virtual byte to avoid division by zero
+        return (self.downloaded_bytes / (self.total_bytes + 1)) * 100
+
+
+class RemoteScheduler:
+    """
+    Stands in for the DownloadScheduler of the engine process on the UI side:
+    reads come from the last progress published, changes go to the engine.
+    """
+
+    def __init__(self, engine: "DownloadEngine", policy: str) -> None:
+        self._engine = engine
+        self._policy = policy
+        self._roms: dict[int, Rom] = {}
+        self._items: list[QueueItem] = []
+        self._total_count = 0
+        self._total_bytes = 0
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    @policy.setter
+    def policy(self, policy: str) -> None:
+        self._policy = policy
+        self._engine.send({"op": "policy", "policy": policy})
+
+    def remember(self, roms: list[Rom]) -> None:
+        for rom in roms:
+            self._roms[rom.id] = rom
+
+    def rom(self, rom_id: int) -> Optional[Rom]:
+        if rom_id not in self._roms:
+            # Queued by the engine itself from the journal
+            self.remember(self._engine.journal_roms())
+        return self._roms.get(rom_id)
+
+    def prioritize(self, rom: Rom) -> bool:
+        return self._engine.send({"op": "prioritize", "id": rom.id})
+
+    def update(self, snapshot: EngineSnapshot, downloads: dict) -> None:
+        items = []
+        for slot in snapshot.items:
+            rom = self.rom(slot.rom_id)
+            if rom is None:
+                continue
+            item = QueueItem(rom)
+            item.state = slot.state
+            item.position = slot.position
+            if slot.state == QueueState.ACTIVE:
+                item.download = downloads.get(slot.rom_id)
+            items.append(item)
+        self._items = items
+        self._total_count = snapshot.total_count
+        self._total_bytes = snapshot.total_bytes
+
+    def snapshot(self) -> list[QueueItem]:
+        return list(self._items)
+
+    @property
+    def total_count(self) -> int:
+        return self._total_count
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+
+class DownloadEngine:
+    """
+    Runs the ROM download queue in a process of its own, so downloading,
+    hashing and extracting don't compete with the render loop for the GIL.
+    Commands go to the engine as JSON lines on its stdin and its progress
+    comes back through an EngineProgress, which a mirror thread copies into
+    Status for the UI. An engine that dies is started again, with the
+    journaled queue resumed by `restore`. After `max_restarts` it's given up
+    on and `fallback` is called with the ROMs it couldn't be sent, to run the
+    queue in the app again. Interactive requests of the app go to the engine
+    through the progress block, so its downloads still back off for browsing.
+    """
+
+    mirror_interval = 0.1  # seconds
+    max_restarts = 3
+    stop_timeout = 5  # seconds
+
+    def __init__(
+        self,
+        status,
+        journal_roms: Callable[[], list[Rom]],
+        restore: Callable[[], None],
+        fallback: Callable[[list[Rom]], None],
+        shaper: BandwidthShaper,
+    ) -> None:
+        self.status = status
+        self.shaper = shaper
+        self.journal_roms = journal_roms
+        self.restore = restore
+        self.fallback = fallback
+        self.progress = EngineProgress()
+        self.scheduler = RemoteScheduler(self, status.download_scheduler.policy)
+        self.alive = False
+        self.restarts = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._send_lock = threading.Lock()
+        self._commands_sent = 0
+        self._error_count = 0
+        self._abort_sent = False
+        self._running = False
+        self._stopped = threading.Event()
+        # Queued while the engine was down, sent once it's back
+        self._unsent: list[Rom] = []
+
+    def start(self) -> None:
+        self._launch()
+        self.shaper.share_interactive(self.progress.set_interactive)
+        self.status.download_scheduler = self.scheduler
+        threading.Thread(target=self._mirror, name="engine", daemon=True).start()
+
+    def _launch(self) -> None:
+        self.progress.clear()
+        self._commands_sent = 0
+        self._error_count = 0
+        self._abort_sent = False
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), self.progress.name],
+            stdin=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+        )
+        self.alive = True
+        print(f"Started download engine, pid {self._process.pid}")
+
+    def send(self, command: dict) -> bool:
+        with self._send_lock:
+            if not self.alive:
+                return False
+            try:
+                self._process.stdin.write(json.dumps(command) + "\n")
+                self._process.stdin.flush()
+            except (OSError, ValueError) as e:
+                # The mirror notices the engine is gone and restarts it
+                print(f"Error sending {command['op']} to the download engine: {e}")
+                return False
+            self._commands_sent += 1
+            return True
+
+    def queue(self, roms: list[Rom]) -> None:
+        self.scheduler.remember(roms)
+        if self.status.download_rom_ready.is_set():
+            self.status.abort_download.clear()
+            self.status.download_rom_ready.clear()
+        if not self.send({"op": "queue", "roms": [list(rom) for rom in roms]}):
+            self._unsent.extend(roms)
+
+    def _apply(self, snapshot: EngineSnapshot) -> None:
+        downloads = {
+            slot.rom_id: EngineDownload(self.scheduler.rom(slot.rom_id), slot)
+            for slot in snapshot.active
+        }
+        self.scheduler.update(snapshot, downloads)
+        self.status.active_downloads = list(downloads.values())
+        self.status.finished_downloads = snapshot.finished_downloads
+        self.status.finished_download_bytes = snapshot.finished_bytes
+        if snapshot.error_count != self._error_count:
+            self._error_count = snapshot.error_count
+            self.status.report_download_error(snapshot.error)
+        # Until the engine has seen every command sent, its state is stale
+        if snapshot.commands_done < self._commands_sent:
+            return
+        if snapshot.running:
+            self.status.download_rom_ready.clear()
+        elif self._running or not self.status.download_rom_ready.is_set():
+            self.status.multi_selected_roms = []
+            self.status.download_rom_ready.set()
+        self._running = snapshot.running
+
+    def _forward_abort(self) -> None:
+        if not self.status.abort_download.is_set():
+            self._abort_sent = False
+        elif not self._abort_sent and self._running:
+            self._abort_sent = self.send({"op": "abort"})
+
+    def _engine_died(self) -> bool:
+        """Start the engine again, False once it's given up on."""
+        code = self._process.poll()
+        with self._send_lock:
+            self.alive = False
+        print(f"Download engine exited with code {code}")
+        self.status.active_downloads = []
+        self._running = False
+        self.status.download_rom_ready.set()
+        self.restarts += 1
+        unsent, self._unsent = self._unsent, []
+        if self.restarts > self.max_restarts:
+            self.status.report_download_error(
+                "Download engine keeps failing, downloading in the app"
+            )
+            self.shaper.share_interactive(None)
+            self.progress.close(unlink=True)
+            self.fallback(unsent)
+            return False
+        self.status.report_download_error("Download engine stopped, restarting it")
+        self._launch()
+
+        def resume() -> None:
+            self.restore()
+            if unsent:
+                self.queue(unsent)
+
+        threading.Thread(target=resume).start()
+        return True
+
+    def _mirror(self) -> None:
+        while not self._stopped.is_set():
+            if self._process.poll() is not None and not self._stopped.is_set():
+                if not self._engine_died():
+                    return
+                continue
+            snapshot = self.progress.read()
+            if snapshot is not None:
+                self._apply(snapshot)
+            self._forward_abort()
+            time.sleep(self.mirror_interval)
+
+    def stop(self) -> None:
+        """Stop the engine with the app, its queue is resumed at next launch."""
+        self._stopped.set()
+        with self._send_lock:
+            self.alive = False
+            try:
+                # The engine aborts and exits once its stdin is closed
+                self._process.stdin.close()
+            except OSError:
+                pass
+        try:
+            self._process.wait(self.stop_timeout)
+        except subprocess.TimeoutExpired:
+            print("Download engine didn't stop, killing it")
+            self._process.kill()
+        self.shaper.share_interactive(None)
+        self.progress.close(unlink=True)
+
+
+def _publish(status, progress: EngineProgress, state: dict) -> None:
+    scheduler = status.download_scheduler
+    items = scheduler.snapshot()
+    rom_ids = {id(item.download): item.rom.id for item in items if item.download}
+    active = [
+        ActiveSlot(
+            rom_ids.get(id(download), 0),
+            download.position,
+            download.total_bytes,
+            download.downloaded_bytes,
+            download.extracted_percent,
+            download.rate,
+            download.eta if download.eta is not None else -1.0,
+            download.extract_pending,
+            download.extracting,
+        )
+        for download in list(status.active_downloads)
+    ]
+    if status.download_error_time != state["error_time"] and status.download_error:
+        state["error_time"] = status.download_error_time
+        state["error_count"] += 1
+    # Readers take no lock, but there must be a single writer at a time
+    with state["lock"]:
+        progress.publish(
+            state["commands_done"],
+            not status.download_rom_ready.is_set(),
+            scheduler.policy,
+            status.finished_downloads,
+            status.finished_download_bytes,
+            scheduler.total_bytes,
+            scheduler.total_count,
+            state["error_count"],
+            status.download_error or "",
+            active,
+            [ItemSlot(item.rom.id, item.state, item.position) for item in items],
+        )
+
+
+def serve(progress_name: str) -> None:
+    """Run the engine: take commands from stdin until it's closed."""
+    from api import API
+
+    api = API()
+    status = api.status
+    scheduler = status.download_scheduler
+    progress = EngineProgress(progress_name)
+    # Browsing happens in the app, its requests are counted in the progress block
+    api.connection_pool.shaper.external_interactive = progress.interactive
+    state = {
+        "commands_done": 0,
+        "error_count": 0,
+        "error_time": 0.0,
+        "lock": threading.Lock(),
+    }
+
+    def publisher() -> None:
+        while True:
+            _publish(status, progress, state)
+            time.sleep(DownloadEngine.mirror_interval)
+
+    threading.Thread(target=publisher, daemon=True).start()
+    for line in sys.stdin:
+        try:
+            command = json.loads(line)
+            op = command["op"]
+            if op == "queue":
+                api.queue_roms([rom_from_row(data) for data in command["roms"]])
+            elif op == "prioritize":
+                rom = next(
+                    (
+                        item.rom
+                        for item in scheduler.snapshot()
+                        if item.rom.id == command["id"]
+                    ),
+                    None,
+                )
+                if rom is not None:
+                    scheduler.prioritize(rom)
+            elif op == "policy" and command["policy"] in QueuePolicy.ALL:
+                scheduler.policy = command["policy"]
+            elif op == "abort":
+                status.abort_download.set()
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Invalid engine command {line!r}: {e}")
+        state["commands_done"] += 1
+        # Published right away, the UI waits for it to trust the running flag
+        _publish(status, progress, state)
+
+    # The app is gone or closing. Leave like a power loss would, without
+    # aborting, so the journal and the .part files resume at next launch
+    print("Download engine stopping")
+    sys.stdout.flush()
+    os._exit(0)
+
+
+if __name__ == "__main__":
+    base_path = os.path.dirname(os.path.abspath(__file__))
+    sys.path.insert(0, os.path.join(base_path, "deps"))
+
+    from platform_maps import init_env_maps
+
+    log_file = os.environ.get("LOG_FILE", "./logs/log.txt")
+    root, extension = os.path.splitext(log_file)
+    os.makedirs(os.path.dirname(log_file), exist_ok=True)
+    sys.stdout = open(f"{root}.engine{extension}", "w", buffering=1)
+    init_env_maps()
+    serve(sys.argv[1])
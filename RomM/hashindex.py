@@ -0,0 +1,160 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import zlib
+from collections import namedtuple
+from typing import Optional
+
+from models import Rom
+
+IndexedFile = namedtuple(
+    "IndexedFile", ["path", "size", "mtime_ns", "crc", "sha1", "md5"]
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    crc TEXT,
+    sha1 TEXT,
+    md5 TEXT
+);
+"""
+
+
+class StreamingChecksum:
+    """
+    Incremental hashes of a file as it's written: always a CRC32, plus the SHA1
+    or, failing that, the MD5 when the server knows it, to verify the download.
+    """
+
+    def __init__(self, rom: Rom) -> None:
+        self.expected_crc = rom.crc_hash.lower().zfill(8) if rom.crc_hash else ""
+        self.expected_sha1 = (rom.sha1_hash or "").lower()
+        self.expected_md5 = (rom.md5_hash or "").lower()
+        self.reset()
+
+    def reset(self) -> None:
+        self._crc = 0
+        self._sha1 = hashlib.sha1(usedforsecurity=False) if self.expected_sha1 else None
+        self._md5 = (
+            hashlib.md5(usedforsecurity=False)
+            if self.expected_md5 and not self.expected_sha1
+            else None
+        )
+
+    def update(self, data) -> None:
+        self._crc = zlib.crc32(data, self._crc)
+        if self._sha1:
+            self._sha1.update(data)
+        if self._md5:
+            self._md5.update(data)
+
+    def update_from_file(self, path: str, length: Optional[int] = None) -> None:
+        """Hash the first `length` bytes of path, for data not seen while streaming."""
+        remaining = length
+        with open(path, "rb") as f:
+            while remaining is None or remaining > 0:
+                size = 1024 * 1024 if remaining is None else min(1024 * 1024, remaining)
+                chunk = f.read(size)
+                if not chunk:
+                    break
+                self.update(chunk)
+                if remaining is not None:
+                    remaining -= len(chunk)
+
+    @property
+    def crc(self) -> str:
+        return f"{self._crc & 0xFFFFFFFF:08x}"
+
+    @property
+    def sha1(self) -> Optional[str]:
+        return self._sha1.hexdigest() if self._sha1 else None
+
+    @property
+    def md5(self) -> Optional[str]:
+        return self._md5.hexdigest() if self._md5 else None
+
+    @property
+    def can_verify(self) -> bool:
+        return bool(self.expected_crc or self.expected_sha1 or self.expected_md5)
+
+    @property
+    def digest(self) -> Optional[str]:
+        """The strongest hash computed, the one compared with the server's."""
+        return self.sha1 or self.md5 or self.crc
+
+    @property
+    def expected_digest(self) -> str:
+        return self.expected_sha1 or self.expected_md5 or self.expected_crc
+
+    def matches(self) -> bool:
+        return self.digest == self.expected_digest
+
+
+class HashIndex:
+    """
+    Persistent record of the content hashes of files on the device, keyed by
+    path. Entries only count while the file keeps the size and mtime it had
+    when it was hashed.
+    """
+
+    def __init__(self) -> None:
+        self.index_path = os.path.join(os.getcwd(), "cache", "hashes.db")
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._lock, self._db:
+            self._db.executescript(_SCHEMA)
+
+    def record(
+        self,
+        path: str,
+        crc: Optional[str],
+        sha1: Optional[str] = None,
+        md5: Optional[str] = None,
+        stat: Optional[os.stat_result] = None,
+    ) -> None:
+        """Record the hashes of path, as of `stat` when given (taken before hashing)."""
+        if stat is None:
+            stat = os.stat(path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, crc, sha1, md5) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, crc, sha1, md5),
+            )
+
+    def lookup(self, path: str) -> Optional[IndexedFile]:
+        path = os.path.abspath(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT path, size, mtime_ns, crc, sha1, md5 FROM files WHERE path = ?",
+                (path,),
+            ).fetchone()
+        if row is None:
+            return None
+        entry = IndexedFile._make(row)
+        if entry.size != stat.st_size or entry.mtime_ns != stat.st_mtime_ns:
+            return None
+        return entry
+
+    def matches(self, path: str, rom: Rom) -> bool:
+        """Whether path holds exactly the ROM, compared on the strongest hash both sides know."""
+        entry = self.lookup(path)
+        if entry is None or entry.size != rom.fs_size_bytes:
+            return False
+        if entry.sha1 and rom.sha1_hash:
+            return entry.sha1 == rom.sha1_hash.lower()
+        if entry.md5 and rom.md5_hash:
+            return entry.md5 == rom.md5_hash.lower()
+        if entry.crc and rom.crc_hash:
+            return entry.crc == rom.crc_hash.lower().zfill(8)
+        return False
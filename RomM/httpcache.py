@@ -0,0 +1,83 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Optional
+
+
+class ResponseCache:
+    """
+    On-disk cache of parsed API responses with their HTTP validators, so refreshes
+    can be sent as conditional requests and a 304 answered from disk.
+    """
+
+    _instance: Optional["ResponseCache"] = None
+    _initialized: bool = False
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(ResponseCache, cls).__new__(cls)
+        return cls._instance
+
+    def __init__(self) -> None:
+        if self._initialized:
+            return
+
+        self.cache_path = os.path.join(os.getcwd(), "cache", "http")
+        os.makedirs(self.cache_path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._initialized = True
+
+    def _entry_path(self, key: str) -> str:
+        digest = hashlib.sha1(key.encode("utf-8"), usedforsecurity=False).hexdigest()
+        return os.path.join(self.cache_path, f"{digest}.json")
+
+    def _read(self, key: str) -> Optional[dict]:
+        try:
+            with open(self._entry_path(key), "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Guard against hash collisions and entries from older formats
+        if entry.get("key") != key:
+            return None
+        return entry
+
+    def validators(self, key: str) -> dict:
+        """Return the conditional request headers for a cached response, if any."""
+        entry = self._read(key)
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, key: str) -> Any:
+        entry = self._read(key)
+        return entry["data"] if entry else None
+
+    def store(self, key: str, headers, data: Any) -> None:
+        """Persist parsed data for key, only if the server sent validators for it."""
+        etag = headers.get("ETag") if headers else None
+        last_modified = headers.get("Last-Modified") if headers else None
+        path = self._entry_path(key)
+        if not etag and not last_modified:
+            # Nothing to revalidate against, drop any stale entry
+            if os.path.exists(path):
+                os.remove(path)
+            return
+
+        entry = {
+            "key": key,
+            "etag": etag,
+            "last_modified": last_modified,
+            "data": data,
+        }
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f, separators=(",", ":"))
+            os.replace(tmp_path, path)
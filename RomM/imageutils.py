@@ -3,10 +3,12 @@ from io import BytesIO
 from typing import Optional
 from urllib.error import HTTPError, URLError
 from urllib.parse import urljoin
-from urllib.request import Request, urlopen
+from urllib.request import Request
 
 from PIL import Image, ImageDraw
 
+from connection_pool import ConnectionPool
+
 
 class ImageUtils:
     _instance: Optional["ImageUtils"] = None
@@ -25,6 +27,7 @@ class ImageUtils:
             return
 
         self.host = os.getenv("HOST", "").strip("/")
+        self.connection_pool = ConnectionPool()
         self.fade_mask = self.generate_fade_mask()
         self._initialized = True
 
@@ -60,7 +63,7 @@ class ImageUtils:
                 url = urljoin(f"{self.host}/", url)
 
             req = Request(url.split("?")[0], headers=headers)
-            with urlopen(req, timeout=60) as response:  # trunk-ignore(bandit/B310)
+            with self.connection_pool.urlopen(req, timeout=60) as response:
                 data = response.read()
             return Image.open(BytesIO(data)).convert("RGBA")
         except (URLError, HTTPError, IOError) as e:
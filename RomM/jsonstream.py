@@ -0,0 +1,111 @@
+import codecs
+import json
+from typing import Any, BinaryIO, Iterator
+
+_WHITESPACE = " \t\n\r"
+
+
+class JSONItemStream:
+    """
+    Incrementally decode the elements of a JSON array read from a socket or file.
+    Accepts either a top-level array or an object holding the array under `key`
+    (e.g. a RomM page: {"items": [...], "total": n}). Only one element is kept in
+    memory at a time; the other top-level members are collected into `meta` as
+    they are reached, so values placed after the array are known once iteration ends.
+    """
+
+    def __init__(self, fp: BinaryIO, key: str = "items", chunk_size: int = 64 * 1024):
+        self.meta: dict[str, Any] = {}
+        self.items_read = 0
+        self._fp = fp
+        self._key = key
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        # Drop what was already consumed so the buffer stays around one item
+        if self._pos:
+            self._buffer = self._buffer[self._pos :]
+            self._pos = 0
+        data = self._fp.read(self._chunk_size)
+        if not data:
+            self._eof = True
+            self._buffer += self._text_decoder.decode(b"", final=True)
+            return False
+        self._buffer += self._text_decoder.decode(data)
+        return True
+
+    def _peek(self) -> str:
+        while True:
+            while (
+                self._pos < len(self._buffer) and self._buffer[self._pos] in _WHITESPACE
+            ):
+                self._pos += 1
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON stream")
+
+    def _expect(self, char: str) -> None:
+        if self._peek() != char:
+            raise ValueError(
+                f"Expected {char!r} in JSON stream, got {self._buffer[self._pos]!r}"
+            )
+        self._pos += 1
+
+    def _value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number ending exactly at the buffer end may continue in the next chunk
+            if end == len(self._buffer) and self._fill():
+                continue
+            self._pos = end
+            return value
+
+    def _array(self) -> Iterator[Any]:
+        self._expect("[")
+        if self._peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self._value()
+            self.items_read += 1
+            if self._peek() == ",":
+                self._pos += 1
+                continue
+            self._expect("]")
+            return
+
+    def __iter__(self) -> Iterator[Any]:
+        if self._peek() == "[":
+            yield from self._array()
+            return
+
+        self._expect("{")
+        if self._peek() == "}":
+            self._pos += 1
+            return
+        while True:
+            name = self._value()
+            self._expect(":")
+            if name == self._key and self._peek() == "[":
+                yield from self._array()
+            else:
+                self.meta[name] = self._value()
+            if self._peek() == ",":
+                self._pos += 1
+                continue
+            self._expect("}")
+            return
@@ -56,6 +56,7 @@ if not apply_pending_update():
 
 
 def cleanup(romm: RomM, exit_code: int):
+    romm.api.shutdown()
     romm.ui.cleanup()
     romm.input.cleanup()
 
@@ -81,3 +81,9 @@ ScreenShot = namedtuple(
         "created_at",
         "updated_at",
     ]) 
+
+
+def rom_from_row(row: list) -> Rom:
+    """Rebuild a Rom stored as a plain JSON row, where fs_size became a list."""
+    rom = Rom._make(row)
+    return rom._replace(fs_size=tuple(rom.fs_size))
@@ -0,0 +1,104 @@
+import json
+import os
+from typing import Optional
+
+
+class PartFile:
+    """
+    A download in progress: the data lands in `<dest>.part` and a JSON sidecar
+    records how many bytes of it are valid and the validator of the remote file,
+    so an interrupted transfer can be continued with a Range request.
+    Segmented downloads record one [start, next, end] entry per byte range
+    instead, `next` being the first byte still missing and `end` inclusive.
+    """
+
+    def __init__(self, dest_path: str, url: str) -> None:
+        self.dest_path = dest_path
+        self.url = url
+        self.part_path = f"{dest_path}.part"
+        self.sidecar_path = f"{dest_path}.part.json"
+        self.received = 0
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        # Full size of the remote file, when the response tells it
+        self.size: Optional[int] = None
+        self.segments: list[list[int]] = []
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.sidecar_path, "r") as f:
+                sidecar = json.load(f)
+            part_size = os.path.getsize(self.part_path)
+        except (OSError, ValueError):
+            return
+        if sidecar.get("url") != self.url or part_size < sidecar.get("received", 0):
+            return
+        self.received = sidecar["received"]
+        self.etag = sidecar.get("etag")
+        self.last_modified = sidecar.get("last_modified")
+        self.segments = sidecar.get("segments", [])
+
+    @property
+    def validator(self) -> Optional[str]:
+        # Weak ETags can't be used with If-Range
+        if self.etag and not self.etag.startswith("W/"):
+            return self.etag
+        return self.last_modified
+
+    def resume_headers(self) -> dict:
+        """Headers asking for the missing tail, only if the remote file can be validated."""
+        if not self.received or not self.validator:
+            return {}
+        return {"Range": f"bytes={self.received}-", "If-Range": self.validator}
+
+    def begin(self, code: int, headers) -> int:
+        """
+        Take in the response to the request built from resume_headers and return
+        the offset to write from: the bytes received so far if the server answered
+        with the expected range, 0 if it sent the whole file again.
+        """
+        content_range = headers.get("Content-Range", "") if headers else ""
+        if code != 206 or not content_range.startswith(f"bytes {self.received}-"):
+            self.received = 0
+        self.etag = headers.get("ETag") if headers else None
+        self.last_modified = headers.get("Last-Modified") if headers else None
+        self.size = None
+        total = content_range.rpartition("/")[2]
+        content_length = headers.get("Content-Length") if headers else None
+        if self.received and total.isdigit():
+            self.size = int(total)
+        elif content_length and content_length.isdigit():
+            self.size = self.received + int(content_length)
+        return self.received
+
+    def save(self) -> None:
+        sidecar = {
+            "url": self.url,
+            "received": self.received,
+            "etag": self.etag,
+            "last_modified": self.last_modified,
+            "segments": self.segments,
+        }
+        tmp_path = f"{self.sidecar_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(sidecar, f)
+        os.replace(tmp_path, self.sidecar_path)
+
+    def reset(self) -> None:
+        self.discard()
+        self.received = 0
+        self.etag = None
+        self.last_modified = None
+        self.segments = []
+
+    def commit(self) -> None:
+        """Move the completed download into place."""
+        os.replace(self.part_path, self.dest_path)
+        if os.path.exists(self.sidecar_path):
+            os.remove(self.sidecar_path)
+
+    def discard(self) -> None:
+        for path in (self.part_path, self.sidecar_path):
+            if os.path.exists(path):
+                os.remove(path)
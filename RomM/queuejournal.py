@@ -0,0 +1,88 @@
+import json
+import os
+import threading
+
+from models import Rom, rom_from_row
+
+
+class QueueJournal:
+    """
+    Append-only record of the ROM download queue, so a queue cut short by a
+    crash, the device sleeping or a flat battery is picked up at next launch.
+    Each line is one event: a ROM queued (with its data), started or finished.
+    Lines are fsynced as they're appended and a line torn by a power loss is
+    ignored. The journal is rewritten atomically whenever a queue starts.
+    """
+
+    def __init__(self, owner: str) -> None:
+        self.journal_path = os.path.join(os.getcwd(), "cache", "download_queue.jsonl")
+        os.makedirs(os.path.dirname(self.journal_path), exist_ok=True)
+        self.owner = owner
+        self._lock = threading.Lock()
+
+    def load(self) -> list[Rom]:
+        """Return the ROMs queued and not finished yet, in queue order."""
+        queued: dict[int, Rom] = {}
+        try:
+            with self._lock, open(self.journal_path, "r") as f:
+                lines = f.readlines()
+        except OSError:
+            return []
+        for line in lines:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            op = entry.get("op")
+            if op == "owner" and entry.get("owner") != self.owner:
+                # Queued against another server or user
+                return []
+            if op == "queued":
+                try:
+                    rom = rom_from_row(entry["rom"])
+                except (KeyError, TypeError):
+                    continue
+                queued[rom.id] = rom
+            elif op == "finished":
+                queued.pop(entry.get("id"), None)
+        return list(queued.values())
+
+    def start(self, roms: list[Rom]) -> None:
+        """Replace the journal with a new queue."""
+        lines = [{"op": "owner", "owner": self.owner}] + [
+            {"op": "queued", "rom": list(rom)} for rom in roms
+        ]
+        tmp_path = f"{self.journal_path}.tmp"
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                f.writelines(json.dumps(line) + "\n" for line in lines)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.journal_path)
+
+    def _append(self, entry: dict) -> None:
+        with self._lock, open(self.journal_path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def queued(self, roms: list[Rom]) -> None:
+        """Add ROMs to the running queue."""
+        with self._lock, open(self.journal_path, "a") as f:
+            f.writelines(
+                json.dumps({"op": "queued", "rom": list(rom)}) + "\n" for rom in roms
+            )
+            f.flush()
+            os.fsync(f.fileno())
+
+    def started(self, rom: Rom) -> None:
+        self._append({"op": "started", "id": rom.id})
+
+    def finished(self, rom: Rom) -> None:
+        """The ROM is no longer pending: downloaded, skipped or failed for good."""
+        self._append({"op": "finished", "id": rom.id})
+
+    def clear(self) -> None:
+        with self._lock:
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
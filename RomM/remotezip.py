@@ -0,0 +1,173 @@
+import fnmatch
+import struct
+import zipfile
+import zlib
+from collections import namedtuple
+from typing import Callable, Optional
+
+_CENTRAL_HEADER = struct.Struct("<4s6HIIIHHHHHII")
+_CENTRAL_HEADER_SIGNATURE = b"PK\x01\x02"
+_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4s4HIIH")
+_END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+_ZIP64_LOCATOR = struct.Struct("<4sIQI")
+_ZIP64_LOCATOR_SIGNATURE = b"PK\x06\x07"
+_ZIP64_END_OF_CENTRAL_DIRECTORY = struct.Struct("<4sQ2H2I4Q")
+_ZIP64_END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x06\x06"
+_ZIP64_EXTRA_ID = 0x0001
+
+_FLAG_ENCRYPTED = 0x01
+_FLAG_UTF8 = 0x800
+
+# End of central directory record with the longest possible comment
+_TAIL_SIZE = _END_OF_CENTRAL_DIRECTORY.size + 0xFFFF + _ZIP64_LOCATOR.size
+
+
+class RangeNotSupported(Exception):
+    """The server sent something else than the requested range of the archive."""
+
+
+# header_offset to end_offset spans the local header, the data and any descriptor
+RemoteMember = namedtuple(
+    "RemoteMember",
+    [
+        "name",
+        "method",
+        "flags",
+        "crc",
+        "compressed_size",
+        "size",
+        "header_offset",
+        "end_offset",
+    ],
+)
+
+
+def read_members(
+    fetch: Callable[[int, Optional[int]], tuple[bytes, int]],
+) -> list[RemoteMember]:
+    """
+    List the members of a zip on a server from its central directory alone.
+    `fetch(start, end)` returns the bytes of the archive from start to end
+    (excluded), or the last -start bytes when end is None, along with the
+    offset of the first byte returned.
+    Raises zipfile.BadZipFile when the archive can't be understood.
+    """
+    tail, tail_offset = fetch(-_TAIL_SIZE, None)
+    eocd = tail.rfind(_END_OF_CENTRAL_DIRECTORY_SIGNATURE)
+    if eocd < 0 or len(tail) - eocd < _END_OF_CENTRAL_DIRECTORY.size:
+        raise zipfile.BadZipFile("End of central directory not found")
+    _, _, _, _, count, cd_size, cd_offset, _ = _END_OF_CENTRAL_DIRECTORY.unpack_from(
+        tail, eocd
+    )
+
+    locator = eocd - _ZIP64_LOCATOR.size
+    if locator >= 0 and tail[locator : locator + 4] == _ZIP64_LOCATOR_SIGNATURE:
+        _, _, zip64_offset, _ = _ZIP64_LOCATOR.unpack_from(tail, locator)
+        start = zip64_offset - tail_offset
+        if start >= 0:
+            record = tail[start : start + _ZIP64_END_OF_CENTRAL_DIRECTORY.size]
+        else:
+            record, _ = fetch(
+                zip64_offset, zip64_offset + _ZIP64_END_OF_CENTRAL_DIRECTORY.size
+            )
+        if record[:4] != _ZIP64_END_OF_CENTRAL_DIRECTORY_SIGNATURE:
+            raise zipfile.BadZipFile("Bad zip64 end of central directory")
+        *_, count, cd_size, cd_offset = _ZIP64_END_OF_CENTRAL_DIRECTORY.unpack_from(
+            record
+        )
+
+    start = cd_offset - tail_offset
+    if start >= 0:
+        directory = tail[start : start + cd_size]
+    else:
+        directory, _ = fetch(cd_offset, cd_offset + cd_size)
+    if len(directory) < cd_size:
+        raise zipfile.BadZipFile("Truncated central directory")
+
+    members = []
+    offset = 0
+    for _ in range(count):
+        if directory[offset : offset + 4] != _CENTRAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile("Bad central directory entry")
+        (
+            _,
+            _version_made,
+            _version_needed,
+            flags,
+            method,
+            _time,
+            _date,
+            crc,
+            compressed_size,
+            size,
+            name_length,
+            extra_length,
+            comment_length,
+            _disk,
+            _internal,
+            _external,
+            header_offset,
+        ) = _CENTRAL_HEADER.unpack_from(directory, offset)
+        name_start = offset + _CENTRAL_HEADER.size
+        extra_start = name_start + name_length
+        raw_name = bytes(directory[name_start:extra_start])
+        extra = bytes(directory[extra_start : extra_start + extra_length])
+        offset = extra_start + extra_length + comment_length
+
+        # Zip64 fields are present in this order, only for those that overflowed
+        values = [size, compressed_size, header_offset]
+        position = 0
+        while position + 4 <= len(extra):
+            field_id, field_length = struct.unpack_from("<HH", extra, position)
+            if field_id == _ZIP64_EXTRA_ID:
+                field = position + 4
+                for i, value in enumerate(values):
+                    if value == 0xFFFFFFFF and field + 8 <= position + 4 + field_length:
+                        (values[i],) = struct.unpack_from("<Q", extra, field)
+                        field += 8
+            position += 4 + field_length
+        size, compressed_size, header_offset = values
+
+        members.append(
+            RemoteMember(
+                raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437"),
+                method,
+                flags,
+                crc,
+                compressed_size,
+                size,
+                header_offset,
+                cd_offset,
+            )
+        )
+
+    # Each member runs until the next one, the last until the central directory
+    members.sort(key=lambda member: member.header_offset)
+    for i in range(len(members) - 1):
+        members[i] = members[i]._replace(end_offset=members[i + 1].header_offset)
+    return members
+
+
+def can_extract(member: RemoteMember) -> bool:
+    return not member.flags & _FLAG_ENCRYPTED and member.method in (
+        zipfile.ZIP_STORED,
+        zipfile.ZIP_DEFLATED,
+    )
+
+
+def matches_rules(name: str, include: list[str], exclude: list[str]) -> bool:
+    """Whether a member passes the include and exclude patterns, case insensitive."""
+    name = name.lower()
+    if include and not any(
+        fnmatch.fnmatchcase(name, pattern.lower()) for pattern in include
+    ):
+        return False
+    return not any(fnmatch.fnmatchcase(name, pattern.lower()) for pattern in exclude)
+
+
+def file_crc(path: str) -> int:
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            crc = zlib.crc32(chunk, crc)
+    return crc & 0xFFFFFFFF
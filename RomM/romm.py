@@ -1,11 +1,12 @@
 import os
 import threading
 import time
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import sdl2
 import sdl2.ext
 from models import Rom
+from scheduler import QueuePolicy
 
 if os.path.exists(os.path.join(os.path.dirname(__file__), "__version__.py")):
     from __version__ import version
@@ -35,6 +36,7 @@ ButtonConfig = Dict[str, str]
 
 class StartMenuOptions:
     ABORT_DOWNLOAD = f"{glyphs.abort} Abort downloads"
+    DOWNLOAD_QUEUE = f"{glyphs.download} Download queue"
     SD_SWITCH = f"{glyphs.microsd} Switch SD card"
     TOGGLE_LAYOUT = f"{glyphs.user} Toggle button layout"
     EXIT = f"{glyphs.exit} Exit"
@@ -43,6 +45,7 @@ class StartMenuOptions:
 class RomM:
     running: bool = True
     spinner_speed = 0.05
+    download_error_duration = 5  # seconds
 
     def __init__(self) -> None:
         self.api = API()
@@ -59,10 +62,14 @@ class RomM:
         self.collections_selected_position = 0
         self.roms_selected_position = 0
         self.saves_selected_position = 0
+        self.downloads_selected_position = 0
+        # View to go back to when leaving the download queue
+        self.downloads_return_view = View.PLATFORMS
 
         self.max_n_platforms = 10
         self.max_n_collections = 10
         self.max_n_roms = 10
+        self.max_n_downloads = 10
         self.buttons_config: List[ButtonConfig] = []
         self.controller_layout = get_controller_layout()
 
@@ -77,12 +84,13 @@ class RomM:
         # Set start menu options
         self.start_menu_options = [
             (StartMenuOptions.ABORT_DOWNLOAD, 0),
-            (StartMenuOptions.SD_SWITCH, 1 if self.fs._sd2_roms_storage_path else -1),
+            (StartMenuOptions.DOWNLOAD_QUEUE, 1),
+            (StartMenuOptions.SD_SWITCH, 2 if self.fs._sd2_roms_storage_path else -1),
             (
                 StartMenuOptions.TOGGLE_LAYOUT,
-                2 if self.fs._sd2_roms_storage_path else 1,
+                3 if self.fs._sd2_roms_storage_path else 2,
             ),
-            (StartMenuOptions.EXIT, 3 if self.fs._sd2_roms_storage_path else 2),
+            (StartMenuOptions.EXIT, 4 if self.fs._sd2_roms_storage_path else 3),
         ]
 
     def draw_buttons(self):
@@ -188,10 +196,79 @@ class RomM:
                 self.status.updating.clear()
                 self.ui.draw_clear()
 
+    def _download_error_visible(self) -> bool:
+        # Errors from the last download queue stay up for a few seconds
+        return (
+            self.status.download_error is not None
+            and time.monotonic() - self.status.download_error_time
+            < self.download_error_duration
+        )
+
+    @staticmethod
+    def _format_transfer(rate: float, eta: Optional[float]) -> str:
+        if rate >= 1024 * 1024:
+            text = f"{rate / (1024 * 1024):.1f} MB/s"
+        else:
+            text = f"{rate / 1024:.0f} KB/s"
+        if eta is not None:
+            minutes, seconds = divmod(int(eta), 60)
+            text += f" | {minutes}:{seconds:02d} left"
+        return text
+
+    def _render_downloads(self):
+        downloads = list(self.status.active_downloads)
+        if not downloads:
+            return
+        queue_length = self.status.download_scheduler.total_count
+        # Downloads and extraction run side by side, report each stage separately
+        downloading = [
+            d for d in downloads if not d.extract_pending and not d.extracting
+        ]
+        extracting = next((d for d in downloads if d.extracting), None)
+        waiting = sum(1 for d in downloads if d.extract_pending)
+
+        if downloading:
+            current = downloading[0]
+            self.ui.draw_loader(self.status.downloaded_percent)
+            text_line_1 = f"{current.position}/{queue_length} | {self.status.downloaded_percent:.2f}% | {glyphs.download} {current.name}"
+            if len(downloading) > 1:
+                text_line_1 += f" (+{len(downloading) - 1})"
+        elif extracting:
+            current = extracting
+            self.ui.draw_loader(
+                extracting.extracted_percent,
+                color=self.controller_layout["b"]["color"],
+            )
+            text_line_1 = f"{current.position}/{queue_length} | {extracting.extracted_percent:.2f}% | Extracting {extracting.name}"
+        else:
+            current = downloads[0]
+            text_line_1 = f"{current.position}/{queue_length} | Waiting to extract {current.name}"
+
+        if extracting and downloading:
+            text_line_2 = f"Extracting {extracting.name} {extracting.extracted_percent:.0f}%"
+        else:
+            text_line_2 = f"({current.file_name})"
+        if downloading:
+            # Combined rate of the queue, time left for the item shown
+            text_line_2 += " | " + self._format_transfer(
+                self.status.download_rate, current.eta
+            )
+        if waiting:
+            text_line_2 += f" | {waiting} waiting to extract"
+        self.ui.draw_log(
+            text_line_1=text_line_1,
+            text_line_2=text_line_2,
+            background=False,
+        )
+
     def _render_platforms_view(self):
         if self.status.updating.is_set():
             return
 
+        # The list may shrink when the catalog copy is revalidated
+        self.platforms_selected_position = min(
+            self.platforms_selected_position, max(len(self.status.platforms) - 1, 0)
+        )
         if self.status.platforms_ready.is_set():
             self.ui.draw_platforms_list(
                 self.platforms_selected_position,
@@ -207,23 +284,12 @@ class RomM:
                 text_line_1=f"{self.current_spinner_status} Fetching platforms"
             )
         elif not self.status.download_rom_ready.is_set():
-            if self.status.extracting_rom and self.status.downloading_rom:
-                self.ui.draw_loader(
-                    self.status.extracted_percent,
-                    color=self.controller_layout["b"]["color"],
-                )
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.extracted_percent:.2f}% | Extracting {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
-            elif self.status.downloading_rom:
-                self.ui.draw_loader(self.status.downloaded_percent)
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.downloaded_percent:.2f}% | {glyphs.download} {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
+            self._render_downloads()
+        elif self._download_error_visible():
+            self.ui.draw_log(
+                text_line_1=f"Error: {self.status.download_error}",
+                text_color=self.controller_layout["a"]["color"],
+            )
         elif not self.status.valid_host:
             self.ui.draw_log(
                 text_line_1=f"Error: Can't connect to host {self.api.host}",
@@ -259,7 +325,7 @@ class RomM:
     def _update_platforms_view(self):
         if self.input.key(self.controller_layout["a"]["key"]):
             if self.status.roms_ready.is_set() and len(self.status.platforms) > 0:
-                self.status.roms_ready.clear()
+                self.status.start_roms_fetch()
                 self.status.roms = []
                 self.status.selected_platform = self.status.platforms[
                     self.platforms_selected_position
@@ -298,7 +364,11 @@ class RomM:
                 )
 
     def _render_collections_view(self):
-        if self.status.collections_ready.is_set():
+        self.collections_selected_position = min(
+            self.collections_selected_position, max(len(self.status.collections) - 1, 0)
+        )
+        # Each half of the list is shown as soon as it has been fetched
+        if self.status.collections_ready.is_set() or self.status.collections:
             self.ui.draw_collections_list(
                 self.collections_selected_position,
                 self.max_n_collections,
@@ -314,23 +384,12 @@ class RomM:
                 text_line_1=f"{self.current_spinner_status} Fetching collections"
             )
         elif not self.status.download_rom_ready.is_set():
-            if self.status.extracting_rom and self.status.downloading_rom:
-                self.ui.draw_loader(
-                    self.status.extracted_percent,
-                    color=self.controller_layout["b"]["color"],
-                )
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.extracted_percent:.2f}% | Extracting {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
-            elif self.status.downloading_rom:
-                self.ui.draw_loader(self.status.downloaded_percent)
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.downloaded_percent:.2f}% | {glyphs.download} {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
+            self._render_downloads()
+        elif self._download_error_visible():
+            self.ui.draw_log(
+                text_line_1=f"Error: {self.status.download_error}",
+                text_color=self.controller_layout["a"]["color"],
+            )
         elif not self.status.valid_host:
             self.ui.draw_log(
                 text_line_1=f"Error: Can't connect to host {self.api.host}",
@@ -366,7 +425,7 @@ class RomM:
     def _update_collections_view(self):
         if self.input.key(self.controller_layout["a"]["key"]):
             if self.status.roms_ready.is_set() and len(self.status.collections) > 0:
-                self.status.roms_ready.clear()
+                self.status.start_roms_fetch()
                 self.status.roms = []
                 selected_collection = self.status.collections[
                     self.collections_selected_position
@@ -410,15 +469,14 @@ class RomM:
             header_color = self.controller_layout["a"]["color"]
             prepend_platform_slug = False
         elif self.status.selected_platform:
-            header_text = self.status.platforms[
-                self.platforms_selected_position
-            ].display_name
+            header_text = self.status.selected_platform.display_name
             header_color = self.controller_layout["a"]["color"]
             prepend_platform_slug = False
         elif self.status.selected_collection or self.status.selected_virtual_collection:
-            header_text = self.status.collections[
-                self.collections_selected_position
-            ].name
+            header_text = (
+                self.status.selected_collection
+                or self.status.selected_virtual_collection
+            ).name
             header_color = self.controller_layout["b"]["color"]
             prepend_platform_slug = True
         else:
@@ -444,6 +502,9 @@ class RomM:
             self.status.roms_to_show = [
                 r for r in self.status.roms if not self.fs.is_rom_in_device(r)
             ]
+        self.roms_selected_position = min(
+            self.roms_selected_position, max(len(self.status.roms_to_show) - 1, 0)
+        )
 
         self.ui.draw_roms_list(
             self.roms_selected_position,
@@ -460,25 +521,21 @@ class RomM:
             if current_time - self.last_spinner_update >= self.spinner_speed:
                 self.last_spinner_update = current_time
                 self.current_spinner_status = next(glyphs.spinner)
-            self.ui.draw_log(text_line_1=f"{self.current_spinner_status} Fetching roms")
+            progress = (
+                f" {self.status.roms_loaded}/{self.status.roms_total}"
+                if self.status.roms_total
+                else ""
+            )
+            self.ui.draw_log(
+                text_line_1=f"{self.current_spinner_status} Fetching roms{progress}"
+            )
         elif not self.status.download_rom_ready.is_set():
-            if self.status.extracting_rom and self.status.downloading_rom:
-                self.ui.draw_loader(
-                    self.status.extracted_percent,
-                    color=self.controller_layout["b"]["color"],
-                )
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.extracted_percent:.2f}% | Extracting {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
-            elif self.status.downloading_rom:
-                self.ui.draw_loader(self.status.downloaded_percent)
-                self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_rom_position}/{len(self.status.download_queue)} | {self.status.downloaded_percent:.2f}% | {glyphs.download} {self.status.downloading_rom.name}",
-                    text_line_2=f"({self.status.downloading_rom.fs_name})",
-                    background=False,
-                )
+            self._render_downloads()
+        elif self._download_error_visible():
+            self.ui.draw_log(
+                text_line_1=f"Error: {self.status.download_error}",
+                text_color=self.controller_layout["a"]["color"],
+            )
         elif not self.status.valid_host:
             self.ui.draw_log(
                 text_line_1=f"Error: Can't connect to host {self.api.host}",
@@ -541,19 +598,14 @@ class RomM:
 
     def _update_roms_view(self):
         if self.input.key(self.controller_layout["a"]["key"]):
-            if (
-                self.status.roms_ready.is_set()
-                and self.status.download_rom_ready.is_set()
-                and len(self.status.roms_to_show) > 0
-            ):
-                self.status.download_rom_ready.clear()
-                if len(self.status.multi_selected_roms) == 0:
-                    self.status.multi_selected_roms.append(
-                        self.status.roms_to_show[self.roms_selected_position]
-                    )
-                self.status.download_queue = self.status.multi_selected_roms
-                self.status.abort_download.clear()
-                threading.Thread(target=self.api.download_rom).start()
+            # ROMs selected while a queue runs are appended to it
+            if self.status.roms_ready.is_set() and len(self.status.roms_to_show) > 0:
+                roms = self.status.multi_selected_roms or [
+                    self.status.roms_to_show[self.roms_selected_position]
+                ]
+                # Handed over, the next A queues whatever is highlighted or selected then
+                self.status.multi_selected_roms = []
+                threading.Thread(target=self.api.queue_roms, args=(roms,)).start()
         elif self.input.key(self.controller_layout["b"]["key"]):
             if self.status.selected_platform:
                 self.status.current_view = View.PLATFORMS
@@ -571,7 +623,7 @@ class RomM:
             self.status.multi_selected_roms = []
         elif self.input.key(self.controller_layout["y"]["key"]):
             if self.status.roms_ready.is_set():
-                self.status.roms_ready.clear()
+                self.status.start_roms_fetch()
                 threading.Thread(target=self.api.fetch_roms).start()
                 self.status.multi_selected_roms = []
         elif self.input.key(self.controller_layout["x"]["key"]):
@@ -679,7 +731,7 @@ class RomM:
         pos = [self.ui.screen_width / 3, self.ui.screen_height / 3]
         padding = 6
         width = 200
-        n_selectable_options = 4 if self.fs._sd2_roms_storage_path else 3
+        n_selectable_options = 5 if self.fs._sd2_roms_storage_path else 4
         option_height = 28
         gap = 4
         title = "Main menu"
@@ -689,9 +741,9 @@ class RomM:
         layouts = list(BUTTON_CONFIGS.keys())
         current_idx = layouts.index(self.ui.layout_name)
         next_layout = layouts[(current_idx + 1) % len(layouts)]
-        self.start_menu_options[2] = (
+        self.start_menu_options[3] = (
             f"{glyphs.user} Layout: {next_layout.capitalize()}",
-            self.start_menu_options[2][1],
+            self.start_menu_options[3][1],
         )
         self.ui.draw_menu_background(
             pos,
@@ -740,9 +792,15 @@ class RomM:
                 self.status.abort_download.set()
                 self.status.show_start_menu = False
             elif selected_pos == self.start_menu_options[1][1]:
-                self.fs.switch_sd_storage()
+                if self.status.current_view != View.DOWNLOADS:
+                    self.downloads_return_view = self.status.current_view
+                    self.downloads_selected_position = 0
+                self.status.current_view = View.DOWNLOADS
                 self.status.show_start_menu = False
             elif selected_pos == self.start_menu_options[2][1]:
+                self.fs.switch_sd_storage()
+                self.status.show_start_menu = False
+            elif selected_pos == self.start_menu_options[3][1]:
                 layouts = list(BUTTON_CONFIGS.keys())
                 current_idx = layouts.index(self.ui.layout_name)
                 new_layout = layouts[(current_idx + 1) % len(layouts)]
@@ -760,16 +818,18 @@ class RomM:
                     self._render_roms_view()
                 elif self.status.current_view == View.ROM_INFO:
                     self._render_rom_info_view()
+                elif self.status.current_view == View.DOWNLOADS:
+                    self._render_downloads_view()
                 else:
                     self._render_platforms_view()
                 self.ui.render_to_screen()
-            elif selected_pos == self.start_menu_options[3][1]:
+            elif selected_pos == self.start_menu_options[4][1]:
                 self.running = False
                 self.status.show_start_menu = False
         elif self.input.key(self.controller_layout["b"]["key"]):
             self.status.show_start_menu = not self.status.show_start_menu
         else:
-            n_selectable_options = 4 if self.fs._sd2_roms_storage_path else 3
+            n_selectable_options = 5 if self.fs._sd2_roms_storage_path else 4
             self.start_menu_selected_position = self.input.handle_navigation(
                 self.start_menu_selected_position,
                 n_selectable_options,
@@ -795,7 +855,10 @@ class RomM:
             sdl2.SDL_Delay(16)
 
     def start(self):
+        self.api.load_catalog()
         self._render_platforms_view()
+        self.api.start_engine()
+        threading.Thread(target=self.api.restore_download_queue).start()
         threading.Thread(target=self._monitor_input, daemon=True).start()
         threading.Thread(target=self._check_for_updates).start()
         threading.Thread(target=self.api.fetch_platforms).start()
@@ -812,7 +875,9 @@ class RomM:
         if self.status.updating.is_set():
             return
 
-        if self.status.me_ready.is_set():
+        if self.status.offline:
+            self.ui.draw_header(f"{self.api.host} (offline)", self.api.username)
+        elif self.status.me_ready.is_set():
             self.ui.draw_header(self.api.host, self.api.username)
 
         if not self.status.valid_host:
@@ -878,6 +943,13 @@ class RomM:
                     and not self.status.show_contextual_menu
                 ):
                     self._update_rom_info_view()
+            elif self.status.current_view == View.DOWNLOADS:
+                self._render_downloads_view()
+                if (
+                    not self.status.show_start_menu
+                    and not self.status.show_contextual_menu
+                ):
+                    self._update_downloads_view()
             else:
                 self._render_platforms_view()
                 if (
@@ -927,6 +999,74 @@ class RomM:
         self._render_rom_info_view()
         threading.Thread(target=self.api.fetch_rom_info, args=(rom,)).start()
 
+    def _render_downloads_view(self):
+        scheduler = self.status.download_scheduler
+        # A copy: the workers keep updating the queue while it's drawn
+        items = scheduler.snapshot()
+        self.downloads_selected_position = min(
+            self.downloads_selected_position, max(len(items) - 1, 0)
+        )
+        if items:
+            header_text = f"Download queue | {QueuePolicy.LABELS[scheduler.policy]}"
+            # The download engine publishes only the first items of a long queue
+            hidden = scheduler.total_count - len(items)
+            if hidden > 0:
+                header_text += f" | +{hidden} not shown"
+        else:
+            header_text = "Download queue is empty"
+        self.ui.draw_downloads_list(
+            self.downloads_selected_position,
+            self.max_n_downloads,
+            items,
+            header_text,
+            self.controller_layout["a"]["color"],
+        )
+
+        if self._download_error_visible():
+            self.ui.draw_log(
+                text_line_1=f"Error: {self.status.download_error}",
+                text_color=self.controller_layout["a"]["color"],
+            )
+        else:
+            self.buttons_config = [
+                {
+                    "key": self.controller_layout["a"]["btn"],
+                    "label": "Move to top",
+                    "color": self.controller_layout["a"]["color"],
+                },
+                {
+                    "key": self.controller_layout["b"]["btn"],
+                    "label": "Back",
+                    "color": self.controller_layout["b"]["color"],
+                },
+                {
+                    "key": self.controller_layout["x"]["btn"],
+                    "label": f"Order:{QueuePolicy.LABELS[scheduler.policy]}",
+                    "color": self.controller_layout["x"]["color"],
+                },
+            ]
+            self.draw_buttons()
+
+    def _update_downloads_view(self):
+        scheduler = self.status.download_scheduler
+        items = scheduler.snapshot()
+        if self.input.key(self.controller_layout["a"]["key"]):
+            if self.downloads_selected_position < len(items):
+                scheduler.prioritize(items[self.downloads_selected_position].rom)
+        elif self.input.key(self.controller_layout["b"]["key"]):
+            self.status.current_view = self.downloads_return_view
+        elif self.input.key(self.controller_layout["x"]["key"]):
+            policies = QueuePolicy.ALL
+            scheduler.policy = policies[
+                (policies.index(scheduler.policy) + 1) % len(policies)
+            ]
+        else:
+            self.downloads_selected_position = self.input.handle_navigation(
+                self.downloads_selected_position,
+                self.max_n_downloads,
+                len(items),
+            )
+
     def _render_rom_info_view(self):
         if self.status.selected_rom is None and self.status.saves_ready.is_set():
             header_text = "No ROM selected"
@@ -972,10 +1112,10 @@ class RomM:
                 self.current_spinner_status = next(glyphs.spinner)
             self.ui.draw_log(text_line_1=f"{self.current_spinner_status} Fetching saves/states")
         elif not self.status.download_saves_ready.is_set():
-            if self.status.downloading_save:
-                self.ui.draw_loader(self.status.downloaded_percent)
+            if self.status.downloading_save and self.status.save_download:
+                self.ui.draw_loader(self.status.save_download.downloaded_percent)
                 self.ui.draw_log(
-                    text_line_1=f"{self.status.downloading_save_position}/{len(self.status.download_queue_saves)} | {self.status.downloaded_percent:.2f}% | {glyphs.download} {self.status.downloading_save.file_name_no_tags}.{self.status.downloading_save.file_extension}",
+                    text_line_1=f"{self.status.downloading_save_position}/{len(self.status.download_queue_saves)} | {self.status.save_download.downloaded_percent:.2f}% | {glyphs.download} {self.status.downloading_save.file_name_no_tags}.{self.status.downloading_save.file_extension}",
                     text_line_2=f"({self.status.downloading_save.file_name})",
                     background=False,
                 )
@@ -0,0 +1,208 @@
+import threading
+from typing import Optional
+
+from models import Rom
+
+
+class QueuePolicy:
+    NAME = "name"
+    SMALLEST_FIRST = "smallest"
+    LARGEST_FIRST = "largest"
+    PLATFORM = "platform"
+
+    ALL = (NAME, SMALLEST_FIRST, LARGEST_FIRST, PLATFORM)
+    LABELS = {
+        NAME: "Name",
+        SMALLEST_FIRST: "Smallest first",
+        LARGEST_FIRST: "Largest first",
+        PLATFORM: "Platform",
+    }
+
+
+class QueueState:
+    PENDING = "pending"
+    ACTIVE = "active"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class QueueItem:
+    """One ROM of the download queue. `download` is set while it's active."""
+
+    def __init__(self, rom: Rom) -> None:
+        self.rom = rom
+        self.state = QueueState.PENDING
+        # Order in which items were started, shown as N/M
+        self.position = 0
+        self.download = None
+        # Put back after a failed attempt, goes after the other pending items
+        self.deferred = False
+
+
+class DownloadScheduler:
+    """
+    The ROM download queue of the current session, shared by the UI and the
+    download workers. Workers take the next pending item in the order of the
+    policy, items moved to the top go first. ROMs can be appended and
+    reprioritized while the queue runs. Every call only holds the lock for a
+    short while, and the UI reads copies of the item list.
+    """
+
+    def __init__(self, policy: str = QueuePolicy.NAME) -> None:
+        self._lock = threading.Lock()
+        self.policy = policy
+        self._items: list[QueueItem] = []
+        # Pending items moved to the top, first one first
+        self._pinned: list[QueueItem] = []
+        self._started = 0
+        self.running = False
+
+    def _sort_key(self, item: QueueItem) -> tuple:
+        rom = item.rom
+        if self.policy == QueuePolicy.SMALLEST_FIRST:
+            key: tuple = (rom.fs_size_bytes, rom.name)
+        elif self.policy == QueuePolicy.LARGEST_FIRST:
+            key = (-rom.fs_size_bytes, rom.name)
+        elif self.policy == QueuePolicy.PLATFORM:
+            key = (rom.platform_slug, rom.name)
+        else:
+            key = (rom.name,)
+        return (item.deferred,) + key
+
+    def _pending(self) -> list[QueueItem]:
+        pinned = [item for item in self._pinned if item.state == QueueState.PENDING]
+        rest = sorted(
+            (
+                item
+                for item in self._items
+                if item.state == QueueState.PENDING and item not in pinned
+            ),
+            key=self._sort_key,
+        )
+        return pinned + rest
+
+    def add(self, roms: list[Rom]) -> tuple[list[Rom], bool]:
+        """
+        Queue the ROMs not already pending or active. Returns the ROMs added and
+        whether the queue has to be started, in which case it now counts as running
+        and the items left from the previous queue are forgotten.
+        """
+        with self._lock:
+            start = not self.running
+            if start:
+                # Left pending by a queue that failed
+                self._items = [
+                    item for item in self._items if item.state == QueueState.PENDING
+                ]
+                for item in self._items:
+                    item.position = 0
+                    item.deferred = False
+                self._pinned = []
+                self._started = 0
+                self.running = True
+            queued = {
+                item.rom.id
+                for item in self._items
+                if item.state in (QueueState.PENDING, QueueState.ACTIVE)
+            }
+            added = []
+            for rom in roms:
+                if rom.id not in queued:
+                    queued.add(rom.id)
+                    self._items.append(QueueItem(rom))
+                    added.append(rom)
+            return added, start
+
+    def next(self) -> Optional[QueueItem]:
+        with self._lock:
+            pending = self._pending()
+            if not pending:
+                return None
+            item = pending[0]
+            if item in self._pinned:
+                self._pinned.remove(item)
+            item.state = QueueState.ACTIVE
+            if not item.position:
+                self._started += 1
+                item.position = self._started
+            return item
+
+    def requeue(self, item: QueueItem) -> None:
+        with self._lock:
+            item.state = QueueState.PENDING
+            item.deferred = True
+            item.download = None
+
+    def finish(self, item: QueueItem, state: str = QueueState.DONE) -> None:
+        with self._lock:
+            item.state = state
+            item.download = None
+
+    def prioritize(self, rom: Rom) -> bool:
+        """Move a pending ROM to the top of the queue."""
+        with self._lock:
+            item = next(
+                (
+                    item
+                    for item in self._items
+                    if item.rom.id == rom.id and item.state == QueueState.PENDING
+                ),
+                None,
+            )
+            if item is None:
+                return False
+            if item in self._pinned:
+                self._pinned.remove(item)
+            self._pinned.insert(0, item)
+            return True
+
+    def remove(self, roms: list[Rom]) -> None:
+        """Drop ROMs from the queue, unless they're already started."""
+        ids = {rom.id for rom in roms}
+        with self._lock:
+            self._items = [
+                item
+                for item in self._items
+                if item.rom.id not in ids or item.state != QueueState.PENDING
+            ]
+            self._pinned = [item for item in self._pinned if item in self._items]
+
+    def stop_if_idle(self) -> bool:
+        """Mark the queue stopped unless items are still pending."""
+        with self._lock:
+            if self._pending():
+                return False
+            self.running = False
+            return True
+
+    def stop(self, drop_pending: bool = False) -> None:
+        with self._lock:
+            self.running = False
+            if drop_pending:
+                self._items = [
+                    item for item in self._items if item.state != QueueState.PENDING
+                ]
+                self._pinned = []
+
+    def pending_roms(self) -> list[Rom]:
+        with self._lock:
+            return [item.rom for item in self._pending()]
+
+    def snapshot(self) -> list[QueueItem]:
+        """Items to show: active ones, pending ones in the order they'll run, then finished ones."""
+        with self._lock:
+            active = [item for item in self._items if item.state == QueueState.ACTIVE]
+            finished = [
+                item
+                for item in self._items
+                if item.state in (QueueState.DONE, QueueState.FAILED)
+            ]
+            return active + self._pending() + finished
+
+    @property
+    def total_count(self) -> int:
+        return len(self._items)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(item.rom.fs_size_bytes for item in list(self._items))
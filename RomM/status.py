@@ -1,8 +1,11 @@
 import itertools
 import threading
+import time
+from collections import deque
 from typing import Optional
 
 from models import Collection, Platform, Rom, Save
+from scheduler import DownloadScheduler
 
 
 class View:
@@ -11,6 +14,7 @@ class View:
     VIRTUAL_COLLECTIONS = "virtual_collection"
     ROMS = "roms"
     ROM_INFO = "rom_info"
+    DOWNLOADS = "downloads"
 
 
 class Filter:
@@ -19,6 +23,88 @@ class Filter:
     REMOTE = "remote"
 
 
+class DownloadProgress:
+    """
+    Progress of one file being downloaded, written by the worker handling it.
+    Also keeps the figures of the transfer itself: bytes received in this
+    session, time to first byte, time the network and disk sides of the
+    transfer spent waiting on each other and a throughput over the last `rate_window` seconds.
+    """
+
+    rate_window = 5.0  # seconds
+
+    def __init__(self, name: str, file_name: str, total_bytes: int, position: int = 0):
+        self.name = name
+        self.file_name = file_name
+        self.total_bytes = total_bytes
+        self.position = position
+        self.downloaded_bytes = 0
+        # Downloaded, waiting for the extraction worker
+        self.extract_pending = False
+        self.extracting = False
+        self.extracted_percent = 0.0
+        # Extracted while downloading, no zip left to extract
+        self.extracted = False
+
+        self.started = time.monotonic()
+        self.transferred_bytes = 0
+        self.ttfb: Optional[float] = None
+        # Time the network waited on the SD card, and the SD card on the network
+        self.write_stall = 0.0
+        self.read_stall = 0.0
+        self._samples: deque[tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def downloaded_percent(self) -> float:
+        # Add 1 virtual byte to avoid division by zero
+        return (self.downloaded_bytes / (self.total_bytes + 1)) * 100
+
+    def add_downloaded(self, n: int) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.downloaded_bytes += n
+            self.transferred_bytes += n
+            if not self._samples:
+                # Rate from the start of the transfer until the window fills
+                self._samples.append((self.started, 0))
+            self._samples.append((now, self.transferred_bytes))
+            while (
+                len(self._samples) > 2 and now - self._samples[1][0] >= self.rate_window
+            ):
+                self._samples.popleft()
+
+    def add_write_stall(self, seconds: float) -> None:
+        with self._lock:
+            self.write_stall += seconds
+
+    def add_read_stall(self, seconds: float) -> None:
+        with self._lock:
+            self.read_stall += seconds
+
+    @property
+    def rate(self) -> float:
+        """Bytes per second over the last few seconds, 0 until data arrives."""
+        with self._lock:
+            if len(self._samples) < 2:
+                return 0.0
+            (first_time, first_bytes), (_, last_bytes) = (
+                self._samples[0],
+                self._samples[-1],
+            )
+        # A stalled transfer has no recent samples, count the time since
+        elapsed = time.monotonic() - first_time
+        return (last_bytes - first_bytes) / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Seconds left at the current rate, None while it's unknown."""
+        rate = self.rate
+        if not rate:
+            return None
+        return max(self.total_bytes - self.downloaded_bytes, 0) / rate
+
+
 class Status:
     _instance: Optional["Status"] = None
 
@@ -30,6 +116,8 @@ class Status:
     def __init__(self) -> None:
         self.valid_host = True
         self.valid_credentials = True
+        # Server unreachable, views are served from the local catalog
+        self.offline = False
 
         self.me = None
         self.profile_pic_path = ""
@@ -50,6 +138,8 @@ class Status:
         self.collections: list[Collection] = []
         self.roms: list[Rom] = []
         self.roms_to_show: list[Rom] = []
+        self.roms_loaded = 0
+        self.roms_total = 0
         self.filters = itertools.cycle([Filter.ALL, Filter.LOCAL, Filter.REMOTE])
         self.current_filter = next(self.filters)
         self.saves: list[Save] = []
@@ -64,6 +154,7 @@ class Status:
         self.saves_ready = threading.Event()
         self.save_upload_ready = threading.Event()
         self.abort_download = threading.Event()
+        self.roms_fetch_abort = threading.Event()
         self.me_ready = threading.Event()
         self.updating = threading.Event()
 
@@ -73,13 +164,14 @@ class Status:
         self.abort_download.set()
 
         self.multi_selected_roms: list[Rom] = []
-        self.download_queue: list[Rom] = []
-        self.downloading_rom: Optional[Rom] = None
-        self.downloading_rom_position = 0
-        self.total_downloaded_bytes = 0
-        self.downloaded_percent = 0.0
-        self.extracting_rom = False
-        self.extracted_percent = 0.0
+        self.download_scheduler = DownloadScheduler()
+        # ROMs being downloaded or extracted by the queue workers, oldest first
+        self.active_downloads: list[DownloadProgress] = []
+        self.finished_downloads = 0
+        self.finished_download_bytes = 0
+        self.download_lock = threading.Lock()
+        self.download_error: Optional[str] = None
+        self.download_error_time = 0.0
 
         # Saves variables
         self.saves_ready.set()
@@ -91,6 +183,56 @@ class Status:
         self.download_queue_saves: list[Save] = []
         self.downloading_save: Optional[Save] = None
         self.downloading_save_position = 0
+        self.save_download: Optional[DownloadProgress] = None
+
+    @property
+    def downloaded_percent(self) -> float:
+        """Progress of the whole ROM download queue, in bytes."""
+        downloaded = self.finished_download_bytes + sum(
+            download.downloaded_bytes for download in list(self.active_downloads)
+        )
+        # Add 1 virtual byte to avoid division by zero
+        return (downloaded / (self.download_scheduler.total_bytes + 1)) * 100
+
+    @property
+    def download_rate(self) -> float:
+        """Combined throughput of the ROM downloads in progress, in bytes per second."""
+        return sum(
+            download.rate
+            for download in list(self.active_downloads)
+            if not download.extract_pending and not download.extracting
+        )
+
+    def start_download(self, rom: Rom, position: int) -> DownloadProgress:
+        download = DownloadProgress(rom.name, rom.fs_name, rom.fs_size_bytes, position)
+        with self.download_lock:
+            self.active_downloads = self.active_downloads + [download]
+        return download
+
+    def finish_download(self, download: DownloadProgress, done: bool = True) -> None:
+        """Drop a download from the active ones, counting it unless it was re-queued."""
+        with self.download_lock:
+            self.active_downloads = [
+                d for d in self.active_downloads if d is not download
+            ]
+            if done:
+                self.finished_downloads += 1
+                self.finished_download_bytes += download.total_bytes
+
+    def report_download_error(self, message: str) -> None:
+        print(message)
+        self.download_error = message
+        self.download_error_time = time.monotonic()
+
+    def start_roms_fetch(self) -> None:
+        self.roms_fetch_abort.set()
+        self.roms_fetch_abort = threading.Event()
+        self.roms_ready.clear()
 
     def reset_roms_list(self) -> None:
+        # Stop any page still being fetched for the view we're leaving
+        self.roms_fetch_abort.set()
+        self.roms_ready.set()
         self.roms = []
+        self.roms_loaded = 0
+        self.roms_total = 0
@@ -0,0 +1,270 @@
+import os
+import struct
+import zipfile
+import zlib
+from typing import Callable, Optional
+
+from remotezip import RemoteMember
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHIIIHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x01\x02"
+_END_OF_CENTRAL_DIRECTORY_SIGNATURE = b"PK\x05\x06"
+_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+_ZIP64_EXTRA_ID = 0x0001
+
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+
+class StreamingUnsupported(Exception):
+    """The archive can't be extracted as it streams, the whole zip is needed."""
+
+
+class StreamingUnzip:
+    """
+    Extract a zip archive from its bytes as they arrive, following the local
+    file headers, so multi-file ROMs never sit on the SD card as a zip.
+    Members are written under dest_dir, at their path passed through
+    `sanitize`. Stored and deflated members are supported, deflated ones also
+    when followed by a data descriptor. A stored member with a data descriptor
+    has no known end and raises StreamingUnsupported before any of it is written.
+    The stream is ignored from the central directory on.
+    Given the central directory entries of `members`, in archive order, the
+    stream runs from the header of the first one to the end of the last one,
+    with the bytes between two of them skipped. Sizes and CRCs are taken from
+    the entries, so any kind of stored or deflated member can be extracted.
+    """
+
+    # Inflate at most this much at once, ISOs full of padding compress very well
+    max_inflate = 4 * 1024 * 1024
+
+    def __init__(
+        self,
+        dest_dir: str,
+        sanitize: Callable[[str], str],
+        on_member: Optional[Callable[[str], None]] = None,
+        members: Optional[list[RemoteMember]] = None,
+    ) -> None:
+        self.dest_dir = os.path.realpath(dest_dir)
+        self.sanitize = sanitize
+        self.on_member = on_member
+        self.members = members
+        self._next_member = 0
+        # Bytes to drop before the next header: a descriptor, members not wanted
+        self._skip = 0
+        self.finished = False
+        self.extracted_bytes = 0
+        self._buffer = bytearray()
+        self._target = None
+        self._target_path: Optional[str] = None
+        self._inflater = None
+        self._remaining: Optional[int] = None
+        self._crc = 0
+        self._expected_crc = 0
+        self._zip64 = False
+        self._in_descriptor = False
+
+    def _member_path(self, name: str) -> str:
+        path = os.path.realpath(os.path.join(self.dest_dir, self.sanitize(name)))
+        if not path.startswith(self.dest_dir + os.sep):
+            raise zipfile.BadZipFile(f"Member outside of the destination: {name}")
+        return path
+
+    def _read_header(self) -> bool:
+        """Open the member whose header starts the buffer, False if incomplete."""
+        if len(self._buffer) < 4:
+            return False
+        signature = bytes(self._buffer[:4])
+        if signature in (
+            _CENTRAL_DIRECTORY_SIGNATURE,
+            _END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+        ):
+            self.finished = True
+            self._buffer.clear()
+            return False
+        if signature != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile("Bad local file header")
+        if len(self._buffer) < _LOCAL_HEADER.size:
+            return False
+        (
+            _,
+            _version,
+            flags,
+            method,
+            _time,
+            _date,
+            crc,
+            compressed_size,
+            _size,
+            name_length,
+            extra_length,
+        ) = _LOCAL_HEADER.unpack_from(self._buffer)
+        header_length = _LOCAL_HEADER.size + name_length + extra_length
+        if len(self._buffer) < header_length:
+            return False
+        name_end = _LOCAL_HEADER.size + name_length
+        raw_name = bytes(self._buffer[_LOCAL_HEADER.size : name_end])
+        extra = bytes(self._buffer[name_end:header_length])
+        name = raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+
+        if flags & _FLAG_ENCRYPTED:
+            raise StreamingUnsupported(f"{name} is encrypted")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise StreamingUnsupported(f"{name} uses compression method {method}")
+        descriptor = bool(flags & _FLAG_DATA_DESCRIPTOR)
+        member = None
+        if self.members is not None:
+            member = self.members[self._next_member]
+            self._next_member += 1
+            # Whatever follows the data is skipped up to the next member
+            descriptor = False
+            crc = member.crc
+        if descriptor and method == zipfile.ZIP_STORED:
+            raise StreamingUnsupported(f"{name} is stored with a data descriptor")
+
+        self._zip64 = False
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, field_length = struct.unpack_from("<HH", extra, offset)
+            if field_id == _ZIP64_EXTRA_ID:
+                self._zip64 = True
+                if compressed_size == 0xFFFFFFFF and field_length >= 16:
+                    # The uncompressed size comes first
+                    (compressed_size,) = struct.unpack_from("<Q", extra, offset + 12)
+            offset += 4 + field_length
+        if member is not None:
+            compressed_size = member.compressed_size
+            next_offset = (
+                self.members[self._next_member].header_offset
+                if self._next_member < len(self.members)
+                else member.end_offset
+            )
+            self._skip = (
+                next_offset - member.header_offset - header_length - compressed_size
+            )
+
+        del self._buffer[:header_length]
+        path = self._member_path(name)
+        if name.endswith("/"):
+            # Directories may still carry an empty deflate stream
+            os.makedirs(path, exist_ok=True)
+            self._target = open(os.devnull, "wb")
+            self._target_path = None
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._target = open(path, "wb")
+            self._target_path = path
+        self._inflater = (
+            zlib.decompressobj(-zlib.MAX_WBITS)
+            if method == zipfile.ZIP_DEFLATED
+            else None
+        )
+        self._remaining = None if descriptor else compressed_size
+        self._crc = 0
+        self._expected_crc = crc
+        return True
+
+    def _write(self, data) -> None:
+        if not data:
+            return
+        self._target.write(data)
+        self._crc = zlib.crc32(data, self._crc)
+        self.extracted_bytes += len(data)
+
+    def _inflate(self, data) -> None:
+        self._write(self._inflater.decompress(data, self.max_inflate))
+        while self._inflater.unconsumed_tail and not self._inflater.eof:
+            tail = self._inflater.unconsumed_tail
+            self._write(self._inflater.decompress(tail, self.max_inflate))
+
+    def _finish_member(self) -> None:
+        self._target.close()
+        self._target = None
+        path, self._target_path = self._target_path, None
+        if self.members is not None and self._next_member == len(self.members):
+            self.finished = True
+            self._buffer.clear()
+        if path is None:
+            return
+        if self._crc & 0xFFFFFFFF != self._expected_crc:
+            os.remove(path)
+            raise zipfile.BadZipFile(f"Bad CRC-32 for {os.path.basename(path)}")
+        if self.on_member is not None:
+            self.on_member(path)
+
+    def _read_data(self) -> bool:
+        """Extract what the buffer holds of the current member, True once complete."""
+        if self._remaining is not None:
+            take = min(len(self._buffer), self._remaining)
+            data = bytes(self._buffer[:take])
+            del self._buffer[:take]
+            self._remaining -= take
+            if self._inflater is not None:
+                self._inflate(data)
+            else:
+                self._write(data)
+            if self._remaining:
+                return False
+            if self._inflater is not None and not self._inflater.eof:
+                raise zipfile.BadZipFile("Truncated deflate stream")
+            self._finish_member()
+            return True
+
+        # Followed by a data descriptor: the deflate stream tells where it ends
+        data = bytes(self._buffer)
+        self._buffer.clear()
+        self._inflate(data)
+        if not self._inflater.eof:
+            return False
+        self._buffer[:0] = self._inflater.unused_data
+        self._in_descriptor = True
+        return True
+
+    def _read_descriptor(self) -> bool:
+        if len(self._buffer) < 4:
+            return False
+        signed = bytes(self._buffer[:4]) == _DATA_DESCRIPTOR_SIGNATURE
+        size_length = 8 if self._zip64 else 4
+        length = (4 if signed else 0) + 4 + 2 * size_length
+        if len(self._buffer) < length:
+            return False
+        (self._expected_crc,) = struct.unpack_from(
+            "<I", self._buffer, 4 if signed else 0
+        )
+        del self._buffer[:length]
+        self._in_descriptor = False
+        self._finish_member()
+        return True
+
+    def _skip_bytes(self) -> bool:
+        take = min(len(self._buffer), self._skip)
+        del self._buffer[:take]
+        self._skip -= take
+        return not self._skip
+
+    def feed(self, data) -> None:
+        if self.finished:
+            return
+        self._buffer += data
+        while not self.finished:
+            if self._in_descriptor:
+                progressed = self._read_descriptor()
+            elif self._target is not None:
+                progressed = self._read_data()
+            elif self._skip:
+                progressed = self._skip_bytes()
+            else:
+                progressed = self._read_header()
+            if not progressed:
+                return
+
+    def discard(self) -> None:
+        """Remove the member being written, after an abort or a failure."""
+        if self._target is not None:
+            self._target.close()
+            self._target = None
+            if self._target_path and os.path.exists(self._target_path):
+                os.remove(self._target_path)
+            self._target_path = None
@@ -0,0 +1,96 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+from bandwidth import BandwidthShaper
+
+
+class StreamWriter:
+    """
+    Copy a response body to a sink through large reusable buffers.
+    Reads go straight into a pooled bytearray with readinto, the read size grows
+    from 64 KB up to 1 MB while the link keeps up and shrinks again when reads
+    get slow, so progress and aborts stay responsive. Progress is reported as
+    byte counts at most every `progress_interval` seconds, and once at the end.
+    With a shaper, every read first waits for the bandwidth it may use.
+    """
+
+    min_chunk_size = 64 * 1024
+    max_chunk_size = 1024 * 1024
+    progress_interval = 0.1  # seconds
+    # Reads taking longer than this shrink the chunk size, faster ones grow it
+    slow_read = 0.5  # seconds
+    fast_read = 0.1  # seconds
+
+    _free_buffers: list[bytearray] = []
+    _buffers_lock = threading.Lock()
+
+    def __init__(
+        self,
+        on_progress: Optional[Callable[[int], Any]] = None,
+        abort: Optional[threading.Event] = None,
+        shaper: Optional[BandwidthShaper] = None,
+    ) -> None:
+        self.on_progress = on_progress
+        self.abort = abort
+        self.shaper = shaper
+
+    @classmethod
+    def _acquire_buffer(cls) -> bytearray:
+        with cls._buffers_lock:
+            if cls._free_buffers:
+                return cls._free_buffers.pop()
+        return bytearray(cls.max_chunk_size)
+
+    @classmethod
+    def _release_buffer(cls, buffer: bytearray) -> None:
+        with cls._buffers_lock:
+            cls._free_buffers.append(buffer)
+
+    def copy(
+        self, source, write: Callable[[memoryview], Any], limit: Optional[int] = None
+    ) -> int:
+        """
+        Copy source into write() until EOF, `limit` bytes or an abort, and return
+        the number of bytes copied. Pending progress is reported even when a
+        read fails, so callers can account for everything written.
+        """
+        buffer = self._acquire_buffer()
+        view = memoryview(buffer)
+        chunk_size = self.min_chunk_size
+        copied = 0
+        unreported = 0
+        last_report = time.monotonic()
+        try:
+            while limit is None or copied < limit:
+                if self.abort is not None and self.abort.is_set():
+                    break
+                size = chunk_size if limit is None else min(chunk_size, limit - copied)
+                if self.shaper is not None:
+                    size = self.shaper.acquire(size, self.abort)
+                started = time.monotonic()
+                n = source.readinto(view[:size])
+                if self.shaper is not None and n < size:
+                    self.shaper.refund(size - (n or 0))
+                if not n:
+                    break
+                write(view[:n])
+                copied += n
+                unreported += n
+
+                now = time.monotonic()
+                elapsed = now - started
+                if n == size and elapsed < self.fast_read:
+                    chunk_size = min(chunk_size * 2, self.max_chunk_size)
+                elif elapsed > self.slow_read:
+                    chunk_size = max(chunk_size // 2, self.min_chunk_size)
+                if self.on_progress and now - last_report >= self.progress_interval:
+                    self.on_progress(unreported)
+                    unreported = 0
+                    last_report = now
+        finally:
+            view.release()
+            self._release_buffer(buffer)
+            if self.on_progress and unreported:
+                self.on_progress(unreported)
+        return copied
@@ -14,6 +14,7 @@ from filesystem import Filesystem
 from glyps import glyphs
 from models import Collection, Platform, Rom, Save
 from PIL import Image, ImageDraw, ImageFont, _typing
+from scheduler import QueueItem, QueueState
 from status import Status
 
 FONT_FILE = {
@@ -587,6 +588,73 @@ class UserInterface:
                 ),
             )
 
+    def draw_downloads_list(
+        self,
+        downloads_selected_position: int,
+        max_n_downloads: int,
+        items: list[QueueItem],
+        header_text: str,
+        header_color: str,
+    ):
+        self.draw_rectangle_r(
+            [10, 50, self.screen_width - 10, 100], 5, outline=color_menu_bg
+        )
+        self.draw_text(
+            (self.screen_width / 2, 62),
+            header_text,
+            color=header_color,
+            anchor="mm",
+        )
+        self.draw_rectangle_r(
+            [10, 70, self.screen_width - 10, self.screen_height - 43],
+            0,
+            fill=color_menu_bg,
+            outline=None,
+        )
+
+        padding = 4  # Additional padding in characters
+        max_len_text = int((self.screen_width - 71) / 11) - padding
+        state_glyphs = {
+            QueueState.ACTIVE: glyphs.download,
+            QueueState.PENDING: glyphs.checkbox,
+            QueueState.DONE: glyphs.checkbox_selected,
+            QueueState.FAILED: glyphs.abort,
+        }
+
+        start_idx = (
+            int(downloads_selected_position / max_n_downloads) * max_n_downloads
+        )
+        end_idx = min(start_idx + max_n_downloads, len(items))
+        for i, item in enumerate(items[start_idx:end_idx]):
+            is_selected = i == (downloads_selected_position % max_n_downloads)
+            row_text = item.rom.name
+
+            # Handle text scrolling
+            if len(row_text) > max_len_text:
+                row_text = row_text + " "
+                shift_offset = (int(time.time() * 2)) % len(row_text)
+                row_text = row_text[shift_offset:] + row_text[:shift_offset]
+                row_text = row_text[:max_len_text]
+
+            download = item.download
+            if item.state == QueueState.ACTIVE and download is not None:
+                if download.extracting:
+                    detail_text = f"{download.extracted_percent:.0f}%"
+                else:
+                    detail_text = f"{download.downloaded_percent:.0f}%"
+            else:
+                detail_text = f"[{item.rom.fs_size[0]}{item.rom.fs_size[1]}]"
+            row_text = f"{state_glyphs[item.state]} {row_text} {detail_text}"
+
+            self.row_list(
+                row_text,
+                (20, 80 + (i * 35)),
+                self.screen_width - 40,
+                32,
+                is_selected,
+                fill=header_color,
+            )
+
     def draw_menu_background(
         self,
         pos: _typing.Coords,
@@ -3,11 +3,11 @@ import re
 from urllib.error import HTTPError, URLError
 from urllib.request import Request, urlopen
 
-import sdl2
 from filesystem import Filesystem
 from glyps import glyphs
 from semver import Version
 from status import Status
+from streamwriter import StreamWriter
 from ui import UserInterface
 
 
@@ -65,26 +65,23 @@ class Update:
                 self.total_size = int(response.getheader("Content-Length", 0)) or 1
                 self.download_percent = 0.0
                 downloaded_bytes = 0
-                chunk_size = 1024
+
+                def on_progress(n: int) -> None:
+                    nonlocal downloaded_bytes
+                    downloaded_bytes += n
+                    self.download_percent = min(
+                        100.0, (downloaded_bytes / self.total_size) * 100
+                    )
+                    self.ui.draw_loader(self.download_percent)
+                    self.ui.draw_log(
+                        text_line_1="Downloading update...",
+                        text_line_2=f"{self.download_percent:.2f} / 100 % | ( {glyphs.download} {update_filename})",
+                        background=True,
+                    )
+                    self.ui.render_to_screen()
 
                 with open(update_filename, "wb") as out_file:
-                    while True:
-                        chunk = response.read(chunk_size)
-                        if not chunk:
-                            break
-                        out_file.write(chunk)
-                        downloaded_bytes += len(chunk)
-                        self.download_percent = min(
-                            100.0, (downloaded_bytes / self.total_size) * 100
-                        )
-                        self.ui.draw_loader(self.download_percent)
-                        self.ui.draw_log(
-                            text_line_1="Downloading update...",
-                            text_line_2=f"{self.download_percent:.2f} / 100 % | ( {glyphs.download} {update_filename})",
-                            background=True,
-                        )
-                        self.ui.render_to_screen()
-                        sdl2.SDL_Delay(16)
+                    StreamWriter(on_progress).copy(response, out_file.write)
 
                 self.status.updating.clear()
                 return True
@@ -0,0 +1,157 @@
+import queue
+import threading
+import time
+from typing import Any, Callable, Optional
+
+
+class WriteBehind:
+    """
+    Hand the writes of a download over to a thread of its own, so an SD card
+    stalling on an erase doesn't stop the socket reads meanwhile.
+    Data is copied into pooled buffers, coalesced up to `buffer_size` while the
+    writer is busy, and written in order by the writer thread with at most
+    `depth` buffers waiting. `on_written` is called from the writer thread with
+    the bytes written so far, that's where progress that must match the disk
+    belongs. Time the network side waits on a full queue is added to the
+    progress as write stall, time the writer waits for data as read stall.
+    An error raised by the writer is raised again from write() or on close.
+    """
+
+    # At most depth + 2 buffers per writer: queued, being filled, being written
+    buffer_size = 256 * 1024
+    depth = 4
+    # Buffers kept for the next writers, the rest is left to the garbage collector
+    max_free_buffers = 8
+    # How long a blocked call waits before looking for a writer failure again
+    poll_interval = 0.1  # seconds
+
+    _free_buffers: list[bytearray] = []
+    _buffers_lock = threading.Lock()
+
+    def __init__(
+        self,
+        write: Callable[[memoryview], Any],
+        on_written: Optional[Callable[[int], Any]] = None,
+        abort: Optional[threading.Event] = None,
+        progress=None,
+    ) -> None:
+        self._write = write
+        self.on_written = on_written
+        self.abort = abort
+        self.progress = progress
+        self._queue: queue.Queue = queue.Queue(maxsize=self.depth)
+        self._buffer: Optional[bytearray] = None
+        self._filled = 0
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="write-behind", daemon=True
+        )
+        self._thread.start()
+
+    @classmethod
+    def _acquire_buffer(cls) -> bytearray:
+        with cls._buffers_lock:
+            if cls._free_buffers:
+                return cls._free_buffers.pop()
+        return bytearray(cls.buffer_size)
+
+    @classmethod
+    def _release_buffer(cls, buffer: bytearray) -> None:
+        with cls._buffers_lock:
+            if len(cls._free_buffers) < cls.max_free_buffers:
+                cls._free_buffers.append(buffer)
+
+    def _aborted(self) -> bool:
+        return self.abort is not None and self.abort.is_set()
+
+    def _put(self, item) -> None:
+        started = time.monotonic()
+        try:
+            while self._error is None:
+                try:
+                    self._queue.put(item, timeout=self.poll_interval)
+                    return
+                except queue.Full:
+                    # Look again whether the writer failed meanwhile
+                    continue
+        finally:
+            if self.progress is not None:
+                self.progress.add_write_stall(time.monotonic() - started)
+        if item is not None:
+            self._release_buffer(item[0])
+
+    def _hand_over(self) -> None:
+        if not self._filled:
+            return
+        buffer, filled = self._buffer, self._filled
+        self._buffer = None
+        self._filled = 0
+        self._put((buffer, filled))
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def write(self, data) -> None:
+        self._raise_error()
+        with memoryview(data) as view:
+            while view:
+                if self._buffer is None:
+                    self._buffer = self._acquire_buffer()
+                n = min(len(view), self.buffer_size - self._filled)
+                self._buffer[self._filled : self._filled + n] = view[:n]
+                self._filled += n
+                view = view[n:]
+                # Coalesce only while the writer has something else to do
+                if self._filled == self.buffer_size or self._queue.empty():
+                    self._hand_over()
+
+    def _run(self) -> None:
+        while True:
+            started = time.monotonic()
+            item = self._queue.get()
+            if self.progress is not None:
+                self.progress.add_read_stall(time.monotonic() - started)
+            if item is None:
+                return
+            buffer, filled = item
+            try:
+                if self._error is None and not self._aborted():
+                    with memoryview(buffer) as view:
+                        self._write(view[:filled])
+                    if self.on_written is not None:
+                        self.on_written(filled)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._release_buffer(buffer)
+
+    def close(self) -> None:
+        """Write out everything handed over, wait for the writer and raise its error."""
+        if self._closed:
+            return
+        self._closed = True
+        if self._error is None:
+            self._hand_over()
+        elif self._buffer is not None:
+            self._release_buffer(self._buffer)
+            self._buffer = None
+        # The writer keeps draining the queue even after a failure
+        self._queue.put(None)
+        self._thread.join()
+        self._raise_error()
+
+    def __enter__(self) -> "WriteBehind":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        # Keep what was received before the failure, but report the failure itself
+        try:
+            self.close()
+        except Exception as e:
+            print(f"Error writing behind a failed transfer: {e}")